@@ -0,0 +1,174 @@
+'''
+Compare the structure-aware token chunker against the previous per-page,
+1000-character splitter on real documents.
+
+    cd backend
+    python -m benchmarks.chunking lecture1.pdf textbook.pdf [--queries q.jsonl] [--embed]
+
+Reports chunk count, embedding-model tokens, index size and retrieval quality
+(hit@k and MRR). Without --queries, keyword queries are sampled from the
+documents' own sentences: a hit is a retrieved chunk that contains the
+sentence. A --queries JSONL file has {"question", "filename", "page"} lines and
+counts a hit when a retrieved chunk from that file spans the page.
+'''
+import os
+import re
+import json
+import time
+import random
+import argparse
+import numpy as np
+from langchain_text_splitters import RecursiveCharacterTextSplitter, MarkdownHeaderTextSplitter
+from src.ingestion.loader import load_file_with_docling
+from src.ingestion.splitter import split_documents, count_tokens
+from src.ingestion.bm25_index import BM25Index, tokenize
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+def legacy_split(documents):
+    '''
+    The splitter this benchmark replaces: each page on its own, then 1000 characters with 200 overlap
+    '''
+    markdown_splitter = MarkdownHeaderTextSplitter(
+        headers_to_split_on=[("#", "Title"), ("##", "Section"), ("###", "Subsection")]
+    )
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, length_function=len)
+    chunks = []
+    for doc in documents:
+        splits = markdown_splitter.split_text(doc.page_content)
+        for split in splits:
+            split.metadata.update(doc.metadata)
+        chunks.extend(text_splitter.split_documents(splits))
+    return chunks
+
+def normalize(text):
+    return " ".join(tokenize(text))
+
+def sample_queries(pages_by_file, n, seed=0):
+    '''
+    Keyword queries built from random content words of random sentences
+    '''
+    rng = random.Random(seed)
+    sentences = []
+    for filename, pages in pages_by_file.items():
+        for doc in pages:
+            for sentence in SENTENCE_PATTERN.split(doc.page_content):
+                words = [w for w in tokenize(sentence) if len(w) > 3]
+                if len(words) >= 8 and not sentence.lstrip().startswith(("#", "|")):
+                    sentences.append((filename, sentence, words))
+    queries = []
+    for filename, sentence, words in rng.sample(sentences, min(n, len(sentences))):
+        queries.append({
+            "question": " ".join(rng.sample(words, 6)),
+            "filename": filename,
+            "sentence": normalize(sentence),
+        })
+    return queries
+
+def is_hit(query, doc):
+    if doc.metadata.get("filename") != query["filename"]:
+        return False
+    if "sentence" in query:
+        return query["sentence"] in normalize(doc.page_content)
+    start = doc.metadata.get("page_start", doc.metadata.get("page_number"))
+    end = doc.metadata.get("page_end", doc.metadata.get("page_number"))
+    return start is not None and start <= query["page"] <= end
+
+def score(queries, rankings, k):
+    hits, reciprocal = 0, 0.0
+    for query, ranked in zip(queries, rankings):
+        for rank, doc in enumerate(ranked[:k], start=1):
+            if is_hit(query, doc):
+                hits += 1
+                reciprocal += 1 / rank
+                break
+    n = max(1, len(queries))
+    return hits / n, reciprocal / n
+
+def bm25_rankings(chunks, queries, k):
+    index = BM25Index()
+    index.add([str(i) for i in range(len(chunks))], chunks)
+    return [index.search(q["question"], k=k) for q in queries]
+
+def dense_rankings(chunks, queries, k, engine):
+    vectors = np.asarray(engine.embed_documents([c.page_content for c in chunks]), dtype=np.float32)
+    rankings = []
+    for query in queries:
+        similarities = vectors @ np.asarray(engine.embed_query(query["question"]), dtype=np.float32)
+        rankings.append([chunks[i] for i in np.argsort(-similarities)[:k]])
+    return rankings
+
+def evaluate(name, chunks, queries, k, dim, engine=None):
+    tokens = count_tokens([c.page_content for c in chunks])
+    text_bytes = sum(len(c.page_content.encode("utf-8")) for c in chunks)
+    postings = sum(len(set(tokenize(c.page_content))) for c in chunks)
+    row = {
+        "splitter": name,
+        "chunks": len(chunks),
+        "tokens": sum(tokens),
+        "mean_tokens": round(sum(tokens) / max(1, len(tokens)), 1),
+        "max_tokens": max(tokens, default=0),
+        "text_kb": round(text_bytes / 1024, 1),
+        "vectors_kb": round(len(chunks) * dim * 4 / 1024, 1),
+        "bm25_postings": postings,
+    }
+    row[f"bm25_hit@{k}"], row["bm25_mrr"] = (round(x, 3) for x in score(queries, bm25_rankings(chunks, queries, k), k))
+    if engine is not None:
+        start = time.perf_counter()
+        rankings = dense_rankings(chunks, queries, k, engine)
+        row["embed_seconds"] = round(time.perf_counter() - start, 1)
+        row[f"dense_hit@{k}"], row["dense_mrr"] = (round(x, 3) for x in score(queries, rankings, k))
+    return row
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--queries", help="JSONL with question/filename/page per line")
+    parser.add_argument("--samples", type=int, default=200, help="sampled queries when --queries is not given")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=768, help="embedding size for the index size estimate")
+    parser.add_argument("--embed", action="store_true", help="also measure dense retrieval with the embedding model")
+    args = parser.parse_args()
+
+    pages_by_file = {}
+    for path in args.files:
+        filename = os.path.basename(path)
+        pages = load_file_with_docling(path)
+        for doc in pages: doc.metadata["filename"] = filename
+        pages_by_file[filename] = pages
+        print(f"Loaded {filename}: {len(pages)} pages")
+
+    if args.queries:
+        with open(args.queries, "r") as f:
+            queries = [json.loads(line) for line in f if line.strip()]
+    else:
+        queries = sample_queries(pages_by_file, args.samples)
+    print(f"{len(queries)} queries\n")
+
+    engine = None
+    if args.embed:
+        from src.ingestion.embeddings import build_embedding_engine
+        engine = build_embedding_engine()
+        args.dim = len(engine.embed_query("dimension probe"))
+
+    candidates = {
+        "legacy (1000 chars/page)": lambda pages: legacy_split(pages),
+        "structure-aware (tokens)": lambda pages: split_documents(pages),
+    }
+    rows = []
+    for name, split in candidates.items():
+        start = time.perf_counter()
+        chunks = [chunk for pages in pages_by_file.values() for chunk in split(pages)]
+        split_seconds = time.perf_counter() - start
+        row = evaluate(name, chunks, queries, args.k, args.dim, engine)
+        row["split_seconds"] = round(split_seconds, 2)
+        rows.append(row)
+
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    widths = {c: max(len(c), *(len(str(row.get(c, ""))) for row in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(str(row.get(c, "")).ljust(widths[c]) for c in columns))
+
+if __name__ == "__main__":
+    main()
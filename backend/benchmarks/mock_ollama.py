@@ -0,0 +1,129 @@
+'''
+A stand-in for the Ollama server that models its prompt cache, for measuring
+prompt layouts without a GPU.
+
+    cd backend
+    python -m benchmarks.mock_ollama --port 11500 [--slots 1] [--prefill-ms 0.2]
+
+Like Ollama, each slot keeps the tokens of the last prompt it processed and a
+new request only evaluates the tokens after the longest common prefix with the
+best-matching slot. The final stream frame reports prompt_eval_count and
+prompt_eval_duration for those tokens only, the same fields Ollama returns.
+Prompts are tokenized into words and punctuation, which is enough to compare
+layouts.
+'''
+import re
+import json
+import time
+import asyncio
+import argparse
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]|\s+")
+ANSWER = "This is a mock answer from the test server."
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text)
+
+def render(messages):
+    '''
+    Flatten chat messages the way a chat template would
+    '''
+    return "".join(f"<|{m.get('role')}|>\n{m.get('content', '')}<|end|>\n" for m in messages) + "<|assistant|>\n"
+
+def common_prefix(a, b):
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+class PromptCache:
+    def __init__(self, slots):
+        self.slots = [[] for _ in range(slots)]
+        self.totals = {"requests": 0, "prompt_tokens": 0, "prompt_eval_count": 0}
+
+    def evaluate(self, tokens):
+        '''
+        Pick the slot sharing the longest prefix (the least useful one if none
+        does), store the prompt there and return the number of tokens to evaluate
+        '''
+        matches = [common_prefix(slot, tokens) for slot in self.slots]
+        best = max(range(len(self.slots)), key=lambda i: (matches[i], -len(self.slots[i])))
+        self.slots[best] = tokens
+        evaluated = len(tokens) - matches[best]
+        self.totals["requests"] += 1
+        self.totals["prompt_tokens"] += len(tokens)
+        self.totals["prompt_eval_count"] += evaluated
+        return evaluated
+
+def create_app(slots=1, prefill_ms=0.2, token_ms=5.0, model="mock"):
+    app = FastAPI()
+    cache = PromptCache(slots)
+    app.state.cache = cache
+
+    async def tags():
+        return {"models": [{"name": model, "model": model}]}
+
+    async def chat(request: Request):
+        body = await request.json()
+        tokens = tokenize(render(body.get("messages", [])))
+        evaluated = cache.evaluate(tokens)
+        answer = tokenize(ANSWER)
+
+        async def frames():
+            start = time.perf_counter()
+            await asyncio.sleep(evaluated * prefill_ms / 1000)
+            prompt_eval_ns = int((time.perf_counter() - start) * 1e9)
+            message = lambda content: {"model": body.get("model", model), "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                                       "message": {"role": "assistant", "content": content}}
+            for token in answer:
+                await asyncio.sleep(token_ms / 1000)
+                yield json.dumps({**message(token), "done": False}) + "\n"
+            total_ns = int((time.perf_counter() - start) * 1e9)
+            yield json.dumps({
+                **message(""),
+                "done": True,
+                "done_reason": "stop",
+                "total_duration": total_ns,
+                "load_duration": 0,
+                "prompt_eval_count": evaluated,
+                "prompt_eval_duration": prompt_eval_ns,
+                "eval_count": len(answer),
+                "eval_duration": total_ns - prompt_eval_ns,
+            }) + "\n"
+
+        if body.get("stream", True):
+            return StreamingResponse(frames(), media_type="application/x-ndjson")
+        content, final = "", None
+        async for frame in frames():
+            final = json.loads(frame)
+            content += final["message"]["content"]
+        final["message"]["content"] = content
+        return final
+
+    async def stats():
+        return cache.totals
+
+    # OLLAMA_URL may or may not carry a /v1 suffix; answer on both
+    for prefix in ("", "/v1"):
+        app.add_api_route(f"{prefix}/api/tags", tags, methods=["GET"])
+        app.add_api_route(f"{prefix}/api/chat", chat, methods=["POST"])
+        app.add_api_route(f"{prefix}/mock/stats", stats, methods=["GET"])
+    return app
+
+def main():
+    import uvicorn
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--slots", type=int, default=1, help="cached prompts kept at once (OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--prefill-ms", type=float, default=0.2, help="simulated time per evaluated prompt token")
+    parser.add_argument("--token-ms", type=float, default=5.0, help="simulated time per generated token")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.slots, args.prefill_ms, args.token_ms), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
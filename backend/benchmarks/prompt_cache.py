@@ -0,0 +1,107 @@
+'''
+Measure how much prompt prefill the LLM server's prompt cache saves with each
+PROMPT_LAYOUT, by replaying the same multi-turn conversations through the chat
+chain and summing the prompt_eval_count Ollama reports.
+
+    cd backend
+    python -m benchmarks.mock_ollama --port 11500 &
+    OLLAMA_URL=http://127.0.0.1:11500 python -m benchmarks.prompt_cache [--sessions 3] [--turns 30]
+
+Works the same against a real Ollama server. Every turn gets different
+retrieved context, as in a real chat. The history comes from a server-side
+session store with a small budget (--history-tokens), so sessions outgrow it
+and older turns get summarized: either a few at a time after every turn
+(rebase_tokens 0) or in blocks once the history is --rebase-tokens past the
+budget, which keeps the prompt prefix stable in between.
+'''
+import time
+import random
+import asyncio
+import argparse
+from config.settings import settings
+from src.chatbot.rag_chains import get_chat_chain
+from src.chatbot.sessions import SessionStore
+
+# (layout, rebase tokens); None = --rebase-tokens
+CONFIGS = (("context_first", 0), ("prefix_stable", 0), ("prefix_stable", None))
+WORDS = ("entropy gradient lecture matrix proof theorem kernel sample variance bias "
+         "estimator network layer signal filter spectrum energy model data").split()
+
+def fake_context(rng, tokens):
+    return " ".join(rng.choice(WORDS) for _ in range(tokens))
+
+async def run_session(chain, store, rng, turns, context_tokens):
+    session, rows, previous = store.create(), [], []
+    for turn in range(turns):
+        question = f"Question {turn}: how does the {rng.choice(WORDS)} relate to the {rng.choice(WORDS)}?"
+        parts, metadata = [], {}
+        history = [(m.type, m.content) for m in store.history(session)]
+        start = time.perf_counter()
+        async for chunk in chain.astream({
+            "context": fake_context(rng, context_tokens),
+            "chat_history": store.history(session),
+            "input": question,
+        }):
+            metadata.update(chunk.response_metadata or {})
+            parts.append(chunk.content)
+        rows.append({
+            "prompt_eval_count": metadata.get("prompt_eval_count", 0),
+            "prompt_eval_ms": metadata.get("prompt_eval_duration", 0) / 1e6,
+            "seconds": time.perf_counter() - start,
+            # The history no longer starts with last turn's history: the cached prefix ends early
+            "rebased": history[:len(previous)] != previous,
+        })
+        previous = history
+        store.append_turn(session, question, "".join(parts))
+        # Let a summary the turn triggered finish, as it would before the user's next message
+        while session.summarizing:
+            await asyncio.sleep(0.01)
+    return rows
+
+async def run_config(layout, rebase_tokens, args):
+    settings.PROMPT_LAYOUT = layout
+    chain = get_chat_chain()
+    store = SessionStore(maxsize=args.sessions, ttl=None, history_tokens=args.history_tokens, rebase_tokens=rebase_tokens)
+    rng = random.Random(args.seed)
+    rows = []
+    for _ in range(args.sessions):
+        rows += await run_session(chain, store, rng, args.turns, args.context_tokens)
+    return {
+        "layout": layout,
+        "rebase_tokens": rebase_tokens,
+        "turns": len(rows),
+        "rebases": sum(r["rebased"] for r in rows),
+        "prompt_eval_tokens": sum(r["prompt_eval_count"] for r in rows),
+        "prompt_eval_ms": round(sum(r["prompt_eval_ms"] for r in rows), 1),
+        "last_turn_eval_tokens": rows[-1]["prompt_eval_count"] if rows else 0,
+        "seconds": round(sum(r["seconds"] for r in rows), 2),
+    }
+
+async def run_configs(args):
+    # One event loop for all runs: the pooled LLM client's connections belong to it
+    return [
+        await run_config(layout, args.rebase_tokens if rebase_tokens is None else rebase_tokens, args)
+        for layout, rebase_tokens in CONFIGS
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=3)
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--context-tokens", type=int, default=600, help="words of retrieved context per turn")
+    parser.add_argument("--history-tokens", type=int, default=100, help="session history budget (SESSION_HISTORY_TOKENS)")
+    parser.add_argument("--rebase-tokens", type=int, default=200, help="block size for prefix_stable (SESSION_REBASE_TOKENS)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"LLM server: {settings.OLLAMA_URL} ({settings.LLM_MODEL_NAME})\n")
+    rows = asyncio.run(run_configs(args))
+
+    columns = list(rows[0])
+    widths = {c: max(len(c), *(len(str(row[c])) for row in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(str(row[c]).ljust(widths[c]) for c in columns))
+
+if __name__ == "__main__":
+    main()
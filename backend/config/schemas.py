@@ -8,4 +8,19 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     message: str
     history: List[ChatMessage] = []
-    selected_files: Optional[List[str]] = []
\ No newline at end of file
+    selected_files: Optional[List[str]] = []
+
+class SessionMessageRequest(BaseModel):
+    message: str
+    selected_files: Optional[List[str]] = []
+
+class UploadSessionRequest(BaseModel):
+    filename: str
+    size: int
+
+class CompleteUploadsRequest(BaseModel):
+    upload_ids: List[str]
+    incremental: bool = False
+
+class BulkDeleteRequest(BaseModel):
+    filenames: List[str]
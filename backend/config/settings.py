@@ -9,11 +9,103 @@ class Settings(BaseSettings):
     OLLAMA_URL: str = os.getenv("OLLAMA_URL", "http://localhost:11434/v1")
     CHROMA_HOST: str = os.getenv("CHROMA_HOST", "localhost")
     CHROMA_PORT: int = int(os.getenv("CHROMA_PORT", 8000))
+    VECTOR_STORE_BACKEND: str = os.getenv("VECTOR_STORE_BACKEND", "chroma")  # chroma (remote server) or memmap (in-process)
     
     # --- MODEL CONFIGURATION ---
     LLM_MODEL_NAME: str = "granite4:latest" 
     
     EMBEDDING_MODEL_NAME: str = "shatonix/granite-embedding-math-cs"
     EMBEDDING_DIM: int = 768 
+    EMBEDDING_DEVICE: str = os.getenv("EMBEDDING_DEVICE", "auto")  # auto, cpu, cuda, mps
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "torch")  # torch or onnx-int8
+    EMBEDDING_ONNX_QUANTIZATION: str = os.getenv("EMBEDDING_ONNX_QUANTIZATION", "avx2")
+    EMBEDDING_PARITY_THRESHOLD: float = float(os.getenv("EMBEDDING_PARITY_THRESHOLD", 0.99))  # min cosine vs fp32
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", 32))
+    # Concurrent query embeddings arriving within this window share one forward pass
+    EMBEDDING_BATCH_WINDOW_MS: float = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", 5))
+    EMBEDDING_MAX_BATCH: int = int(os.getenv("EMBEDDING_MAX_BATCH", 32))
+
+    # --- RETRIEVAL ---
+    RETRIEVAL_LEG_TIMEOUT: float = float(os.getenv("RETRIEVAL_LEG_TIMEOUT", 5.0))
+    RETRIEVAL_DEDUP_THRESHOLD: float = float(os.getenv("RETRIEVAL_DEDUP_THRESHOLD", 0.8))
+    RETRIEVAL_WORKERS: int = int(os.getenv("RETRIEVAL_WORKERS", 8))  # threads shared by all sync retrieval legs
+    # Retrieve on the original message while the follow-up rewrite is running
+    SPECULATIVE_RETRIEVAL: bool = os.getenv("SPECULATIVE_RETRIEVAL", "true").lower() == "true"
+
+    RETRIEVAL_CACHE_SIZE: int = int(os.getenv("RETRIEVAL_CACHE_SIZE", 5000))
+    RETRIEVAL_CACHE_PATH: str = os.getenv("RETRIEVAL_CACHE_PATH", "")  # empty = memory only
+
+    # --- CONTEXT ---
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", 3000))  # LLM tokens of retrieved text per prompt
+    CONTEXT_MIN_PARTIAL_TOKENS: int = int(os.getenv("CONTEXT_MIN_PARTIAL_TOKENS", 64))  # smallest cut-down chunk worth adding
+    LLM_TOKENIZER_NAME: str = os.getenv("LLM_TOKENIZER_NAME", "")  # HF tokenizer for LLM_MODEL_NAME, empty = estimate
+    CONTEXT_CHARS_PER_TOKEN: float = float(os.getenv("CONTEXT_CHARS_PER_TOKEN", 3.5))
+    # prefix_stable: system prompt + history first, context with the question at the end (cache friendly)
+    # context_first: context inside the system prompt (the previous layout)
+    PROMPT_LAYOUT: str = os.getenv("PROMPT_LAYOUT", "prefix_stable")
+
+    # --- CHAT SESSIONS ---
+    SESSION_HISTORY_TOKENS: int = int(os.getenv("SESSION_HISTORY_TOKENS", 1500))  # recent turns kept verbatim
+    # prefix_stable layout: verbatim turns may grow this far past SESSION_HISTORY_TOKENS before the
+    # oldest ones are summarized in one block, so the cached prompt prefix is rebuilt rarely
+    SESSION_REBASE_TOKENS: int = int(os.getenv("SESSION_REBASE_TOKENS", 1500))
+    SESSION_MAX: int = int(os.getenv("SESSION_MAX", 1000))
+    SESSION_TTL: float = float(os.getenv("SESSION_TTL", 24 * 3600))  # seconds since last turn, 0 = no expiry
+
+    # --- CONNECTIONS ---
+    HTTP_KEEPALIVE_SECS: float = float(os.getenv("HTTP_KEEPALIVE_SECS", 60))  # idle pooled connections are kept this long
+    CHROMA_MAX_CONNECTIONS: int = int(os.getenv("CHROMA_MAX_CONNECTIONS", 32))
+    OLLAMA_MAX_CONNECTIONS: int = int(os.getenv("OLLAMA_MAX_CONNECTIONS", 16))
+    OLLAMA_TIMEOUT: float = float(os.getenv("OLLAMA_TIMEOUT", 300))  # seconds without data from Ollama
+    OLLAMA_CONNECT_TIMEOUT: float = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", 5))
+    OLLAMA_RETRIES: int = int(os.getenv("OLLAMA_RETRIES", 2))  # retries of failed connection attempts
+
+    # --- GENERATION ---
+    GENERATION_MAX_CONCURRENT: int = int(os.getenv("GENERATION_MAX_CONCURRENT", 4))  # answers generated at once
+    GENERATION_MAX_QUEUE: int = int(os.getenv("GENERATION_MAX_QUEUE", 32))  # answers waiting for a slot
+    STREAM_FLUSH_INTERVAL_MS: float = float(os.getenv("STREAM_FLUSH_INTERVAL_MS", 50))  # longest wait before buffered tokens are sent, 0 = one frame per token
+    STREAM_FLUSH_CHARS: int = int(os.getenv("STREAM_FLUSH_CHARS", 512))  # or as soon as this many characters are buffered
+
+    # --- QUERY REWRITING ---
+    REWRITE_HISTORY_WINDOW: int = int(os.getenv("REWRITE_HISTORY_WINDOW", 4))  # messages
+    REWRITE_CACHE_SIZE: int = int(os.getenv("REWRITE_CACHE_SIZE", 10000))
+    REWRITE_CACHE_TTL: float = float(os.getenv("REWRITE_CACHE_TTL", 3600))  # seconds
+
+    # --- ANSWER CACHE ---
+    ANSWER_CACHE_ENABLED: bool = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() == "true"
+    ANSWER_CACHE_MAX_DISTANCE: float = float(os.getenv("ANSWER_CACHE_MAX_DISTANCE", 0.05))  # cosine distance
+    ANSWER_CACHE_SIZE: int = int(os.getenv("ANSWER_CACHE_SIZE", 1000))
+    ANSWER_CACHE_TTL: float = float(os.getenv("ANSWER_CACHE_TTL", 0))  # seconds, 0 = no expiry
+
+    # --- RERANKING ---
+    RERANK_MODEL_NAME: str = "ms-marco-MiniLM-L-12-v2"
+    RERANK_BATCH_SIZE: int = int(os.getenv("RERANK_BATCH_SIZE", 0))  # 0 = size from CPU count
+    RERANK_CACHE_SIZE: int = int(os.getenv("RERANK_CACHE_SIZE", 50000))
+
+    # --- INGESTION ---
+    INGEST_WORKERS: int = int(os.getenv("INGEST_WORKERS", 2))  # docling worker processes
+    INGEST_QUEUE_DEPTH: int = int(os.getenv("INGEST_QUEUE_DEPTH", 100))  # max files queued or in flight
+    PARALLEL_CONVERSION_MIN_PAGES: int = int(os.getenv("PARALLEL_CONVERSION_MIN_PAGES", 40))  # split larger PDFs across workers
+    PARALLEL_CONVERSION_PAGES_PER_TASK: int = int(os.getenv("PARALLEL_CONVERSION_PAGES_PER_TASK", 20))
+    TEXT_LAYER_FAST_PATH: bool = os.getenv("TEXT_LAYER_FAST_PATH", "true").lower() == "true"  # skip docling for plain text pages
+    TEXT_LAYER_MIN_CHARS: int = int(os.getenv("TEXT_LAYER_MIN_CHARS", 20))
+    TEXT_LAYER_MAX_IMAGE_AREA: float = float(os.getenv("TEXT_LAYER_MAX_IMAGE_AREA", 0.3))  # share of the page
+    TEXT_LAYER_MAX_PATHS: int = int(os.getenv("TEXT_LAYER_MAX_PATHS", 40))  # more vector paths suggests tables or diagrams
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))  # bytes read/hashed per step
+    UPLOAD_MAX_BYTES: int = int(os.getenv("UPLOAD_MAX_BYTES", 1024 * 1024 * 1024))
+    UPLOAD_SESSION_TTL: int = int(os.getenv("UPLOAD_SESSION_TTL", 24 * 3600))  # seconds before an unfinished upload is dropped
+    VECTOR_STORE_BATCH_SIZE: int = int(os.getenv("VECTOR_STORE_BATCH_SIZE", 4000))  # chunks per vector store add
+
+    # --- CHUNKING ---
+    CHUNK_MAX_TOKENS: int = int(os.getenv("CHUNK_MAX_TOKENS", 384))  # embedding-model tokens per chunk
+    CHUNK_MIN_TOKENS: int = int(os.getenv("CHUNK_MIN_TOKENS", 96))  # smaller neighbouring sections are merged
+    CHUNK_OVERLAP_TOKENS: int = int(os.getenv("CHUNK_OVERLAP_TOKENS", 48))  # at most one repeated sentence
+
+    # --- LOCAL STORAGE ---
+    DATA_DIR: str = os.getenv("DATA_DIR", "data")
+    UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", os.path.join(DATA_DIR, "uploads"))
+    BM25_INDEX_DIR: str = os.getenv("BM25_INDEX_DIR", os.path.join(DATA_DIR, "bm25"))
+    VECTOR_STORE_DIR: str = os.getenv("VECTOR_STORE_DIR", os.path.join(DATA_DIR, "vectors"))  # memmap backend
+    VECTOR_STORE_DTYPE: str = os.getenv("VECTOR_STORE_DTYPE", "float32")  # float32 or float16 (half the size)
 
 settings = Settings()
\ No newline at end of file
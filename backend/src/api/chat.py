@@ -1,86 +1,202 @@
-import json
+import time
 import asyncio
 import os
-from fastapi import APIRouter
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Request
 from langchain_core.messages import HumanMessage, AIMessage
-from config.schemas import ChatRequest
-from src.chatbot.rag_chains import get_chat_chain, get_query_transform_chain
-from src.chatbot.retriever import get_retriever_chain, get_smart_display_name, filter_by_score
+from config.schemas import ChatRequest, SessionMessageRequest
+from config.settings import settings
+from src.chatbot.rag_chains import get_chat_chain
+from src.chatbot.client import record_llm_usage
+from src.chatbot.query_rewrite import rewrite_query
+from src.chatbot.retriever import get_retriever_chain, get_smart_display_name, filter_by_score, retrieval_degraded
+from src.chatbot.retrieval_cache import get_retrieval_cache
+from src.chatbot.answer_cache import get_answer_cache
+from src.chatbot.context import build_context
+from src.chatbot.sessions import get_session_store
+from src.chatbot.scheduler import get_generation_scheduler, QueueFullError
+from src.api.streaming import event_stream
+from src.ingestion.vector_db import get_embedding_function
+from src.ingestion.bm25_index import get_bm25_index
 
 router = APIRouter()
 
+def check_capacity():
+    try:
+        get_generation_scheduler().check_capacity()
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+
 @router.post("/")
-async def chat(request: ChatRequest):
-    return StreamingResponse(
-        generate_chat_response(request.message, request.history, request.selected_files),
-        media_type="application/x-ndjson"
-    )
+async def chat(request: ChatRequest, http_request: Request):
+    """
+    Streams the answer as NDJSON frames, or as server-sent events when the
+    client accepts text/event-stream.
+    """
+    check_capacity()
+    return event_stream(http_request, generate_chat_response(request.message, request.history, request.selected_files))
+
+@router.post("/sessions", status_code=201)
+def create_session():
+    """
+    Start a server-side conversation. Send turns to /sessions/{session_id}/messages.
+    """
+    return {"session_id": get_session_store().create().id}
+
+@router.get("/sessions/{session_id}")
+def get_session(session_id: str):
+    session = get_session_store().get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {
+        "session_id": session.id,
+        "summary": session.summary,
+        "messages": [{"role": role, "content": content} for role, content, _ in [*session.pending, *session.turns]],
+    }
+
+@router.delete("/sessions/{session_id}")
+def delete_session(session_id: str):
+    if not get_session_store().delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"status": "deleted", "session_id": session_id}
+
+@router.post("/sessions/{session_id}/messages")
+async def session_message(session_id: str, request: SessionMessageRequest, http_request: Request):
+    session = get_session_store().get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    check_capacity()
+    return event_stream(http_request, generate_session_response(session, request.message, request.selected_files))
+
+async def generate_session_response(session, message: str, selected_files: list = None):
+    """
+    Answers one turn using the session's stored history, then records the turn.
+    Turns of the same session are answered one at a time. A turn cancelled
+    by a disconnect is not recorded.
+    """
+    store = get_session_store()
+    async with session.lock:
+        answer_parts = []
+        async for event in generate_answer(message, store.history(session), selected_files):
+            if event["type"] == "content":
+                answer_parts.append(event["data"])
+            yield event
+        if answer_parts:
+            store.append_turn(session, message, "".join(answer_parts))
 
 async def generate_chat_response(message: str, history: list, selected_files: list = None):
+    # 1. PREPARE HISTORY
+    langchain_history = []
+    for msg in history:
+        if msg.role == "user":
+            langchain_history.append(HumanMessage(content=msg.content))
+        elif msg.role == "assistant":
+            langchain_history.append(AIMessage(content=msg.content))
+
+    async for event in generate_answer(message, langchain_history, selected_files):
+        yield event
+
+async def generate_answer(message: str, langchain_history: list, selected_files: list = None):
+    """
+    Waits for a generation slot, sending a status event whenever the queue
+    position changes, then streams the answer and closes with an end event
+    carrying token counts and per-stage timings. The slot is released when
+    the answer ends or is cancelled.
+    """
+    start = time.perf_counter()
+    stats = {"tokens": {}, "timings_ms": {}}
+    scheduler = get_generation_scheduler()
     try:
-        # 1. PREPARE HISTORY
-        langchain_history = []
-        for msg in history:
-            if msg.role == "user":
-                langchain_history.append(HumanMessage(content=msg.content))
-            elif msg.role == "assistant":
-                langchain_history.append(AIMessage(content=msg.content))
-
-        # 2. QUERY REWRITING
-        search_query = message
-        is_rewritten = False
-        
-        if langchain_history:
-            rewrite_chain = get_query_transform_chain()
-            try:
-                search_query = await asyncio.to_thread(
-                    rewrite_chain.invoke, 
-                    {"chat_history": langchain_history, "input": message}
-                )
-                is_rewritten = True
-                print(f"Rewritten Query: '{search_query}'")
-            except Exception as e:
-                print(f"Query rewriting failed: {e}")
-
-        # 3. RETRIEVAL (Single Query + File Filter)
-        retriever = get_retriever_chain(file_filters=selected_files)
-        if not retriever:
-            yield json.dumps({"type": "error", "data": "Knowledge base empty."}) + "\n"
+        ticket = scheduler.enqueue()
+    except QueueFullError as e:
+        yield {"type": "error", "data": str(e)}
+        return
+
+    try:
+        position = scheduler.position(ticket)
+        while position:
+            yield {"type": "status", "data": f"Queued, position {position}", "position": position}
+            await scheduler.wait(ticket, position)
+            position = scheduler.position(ticket)
+        stats["timings_ms"]["queue"] = round((time.perf_counter() - start) * 1000, 1)
+
+        async for event in stream_answer(message, langchain_history, selected_files, stats):
+            yield event
+        stats["timings_ms"]["total"] = round((time.perf_counter() - start) * 1000, 1)
+        yield {"type": "end", "data": stats}
+    finally:
+        scheduler.release(ticket)
+
+async def stream_answer(message: str, langchain_history: list, selected_files: list = None, stats: dict = None):
+    timings = {} if stats is None else stats["timings_ms"]
+    tokens = {} if stats is None else stats["tokens"]
+    stage_start = time.perf_counter()
+
+    def lap(stage):
+        nonlocal stage_start
+        now = time.perf_counter()
+        timings[stage] = round((now - stage_start) * 1000, 1)
+        stage_start = now
+
+    try:
+        # 2. CHECK KNOWLEDGE BASE (File Filter)
+        if not get_bm25_index().has_files(selected_files):
+            yield {"type": "error", "data": "Knowledge base empty."}
             return
 
-        # Attempt 1: Search with (potentially rewritten) query
-        docs = await asyncio.to_thread(retriever.invoke, search_query)
+        # Semantic answer cache (history-free questions only)
+        answer_cache = None
+        if settings.ANSWER_CACHE_ENABLED and not langchain_history:
+            answer_cache = get_answer_cache()
+            answer_scope = answer_cache.scope(selected_files)
+            question_embedding = await asyncio.to_thread(get_embedding_function().embed_query, message)
+            cached = answer_cache.lookup(question_embedding, answer_scope)
+            lap("answer_cache")
+            if cached:
+                yield {"type": "sources", "data": cached.sources}
+                yield {"type": "content", "data": cached.content}
+                return
 
-        print(f"\nRaw Results for '{search_query}':")
-        for i, d in enumerate(docs):
-            score = d.metadata.get("relevance_score", 0.0)
-            print(f"   [{i+1}] Score: {score:.4f} | {get_smart_display_name(d)}")
-        print("-" * 40)
-        
-        # Filter by score
-        docs = filter_by_score(docs, threshold=0.7)
+        # 3. QUERY REWRITING + RETRIEVAL
+        if langchain_history and settings.SPECULATIVE_RETRIEVAL:
+            docs, degraded = await speculative_retrieve(message, langchain_history, selected_files)
+        else:
+            search_query = message
+            is_rewritten = False
+
+            if langchain_history:
+                try:
+                    search_query = await rewrite_query(message, langchain_history)
+                    is_rewritten = search_query != message
+                except Exception as e:
+                    print(f"Query rewriting failed: {e}")
+
+            # Attempt 1: Search with (potentially rewritten) query
+            docs, degraded = await retrieve_filtered(search_query, selected_files)
 
-        # If filtering removed everything, try original query
-        if not docs and is_rewritten:
-            print(f"No relevant docs found for rewritten query. Retrying with original: '{message}'")
-            docs = await asyncio.to_thread(retriever.invoke, message)
-            docs = filter_by_score(docs, threshold=0.7)
+            # If filtering removed everything, try original query
+            if not docs and is_rewritten:
+                print(f"No relevant docs found for rewritten query. Retrying with original: '{message}'")
+                docs, degraded = await retrieve_filtered(message, selected_files)
+
+        lap("retrieval")
 
         if not docs:
             print("No relevant documents found above threshold.")
-            yield json.dumps({"type": "content", "data": "Information Not Included."}) + "\n"
+            yield {"type": "content", "data": "Information Not Included."}
             return
 
-        # 4. SEND SOURCES
+        # 4. PACK CONTEXT + SEND SOURCES
+        context = build_context(docs)
         sources_data = []
-        for d in docs:
+        for d in context.docs:
             filename = os.path.basename(d.metadata.get("source", "Unknown"))
             content_preview = d.page_content[:500].replace("\n", " ")
             display_name = get_smart_display_name(d)
             
             # Page Number Logic
             page = d.metadata.get("page_number", "N/A")
+            if d.metadata.get("page_end", page) != page:
+                page = f"{page}-{d.metadata['page_end']}"
             display_label = f"{display_name} (p.{page})"
             
             sources_data.append({
@@ -89,20 +205,108 @@ async def generate_chat_response(message: str, history: list, selected_files: li
                 "content": content_preview
             })
         
-        yield json.dumps({"type": "sources", "data": sources_data}) + "\n"
+        lap("context")
+        yield {"type": "sources", "data": sources_data}
 
         # 5. GENERATION
-        context_text = "\n\n".join([d.page_content for d in docs])
+        context_text = context.text
         rag_chain = get_chat_chain()
 
+        answer_parts = []
+        llm_metadata = {}
+        generation_start = time.perf_counter()
         async for chunk in rag_chain.astream({
             "context": context_text,
             "chat_history": langchain_history, 
             "input": message
         }):
-            if chunk:
-                yield json.dumps({"type": "content", "data": chunk}) + "\n"
+            if chunk.response_metadata:
+                llm_metadata.update(chunk.response_metadata)
+            if chunk.content:
+                if not answer_parts:
+                    timings["first_token"] = round((time.perf_counter() - stage_start) * 1000, 1)
+                answer_parts.append(chunk.content)
+                yield {"type": "content", "data": chunk.content}
+        lap("generation")
+        if usage := record_llm_usage(llm_metadata):
+            tokens.update({"prompt_eval": usage["prompt_eval_count"], "generated": usage["eval_count"]})
+        tokens["chunks"] = len(answer_parts)
+
+        # An answer built on a degraded retrieval is not worth repeating
+        if answer_cache is not None and answer_parts and not degraded:
+            answer_cache.store(
+                message, question_embedding, answer_scope, sources_data,
+                "".join(answer_parts), time.perf_counter() - generation_start
+            )
 
     except Exception as e:
         print(f"Server Error: {e}")
-        yield json.dumps({"type": "error", "data": f"Server Error: {str(e)}"}) + "\n"
\ No newline at end of file
+        yield {"type": "error", "data": f"Server Error: {str(e)}"}
+
+async def retrieve_filtered(query: str, selected_files: list = None):
+    """
+    Retrieves and reranks for one query, keeping only chunks above the score threshold.
+    Repeat questions are answered from the corpus-versioned retrieval cache.
+    Returns (docs, degraded); degraded results (a leg failed) are not cached.
+    """
+    cache = get_retrieval_cache()
+    cache_key = cache.key(query, selected_files)
+    if (cached := cache.lookup(cache_key)) is not None:
+        print(f"Retrieval cache hit for '{query}' ({len(cached)} chunks)")
+        return cached, False
+
+    retriever = get_retriever_chain(file_filters=selected_files)
+    if not retriever:
+        return [], False
+    docs = await retriever.ainvoke(query)
+    degraded = retrieval_degraded(retriever)
+
+    print(f"\nRaw Results for '{query}':")
+    for i, d in enumerate(docs):
+        score = d.metadata.get("relevance_score", 0.0)
+        print(f"   [{i+1}] Score: {score:.4f} | {get_smart_display_name(d)}")
+    print("-" * 40)
+
+    docs = filter_by_score(docs, threshold=0.7)
+    if degraded:
+        print(f"Retrieval for '{query}' was degraded, not caching it")
+    else:
+        cache.store(cache_key, docs)
+    return docs, degraded
+
+async def speculative_retrieve(message: str, langchain_history: list, selected_files: list = None):
+    """
+    Starts retrieval on the original message while the rewrite runs, then
+    retrieves with the rewritten query as soon as it is ready.
+    Rewritten results win when they clear the threshold, otherwise the
+    original ones are used. Work that is no longer needed is cancelled.
+    Returns (docs, degraded) like retrieve_filtered.
+    """
+    original_task = asyncio.create_task(retrieve_filtered(message, selected_files))
+    rewritten_task = None
+    try:
+        try:
+            search_query = await rewrite_query(message, langchain_history)
+        except Exception as e:
+            print(f"Query rewriting failed: {e}")
+            return await original_task
+
+        if " ".join(search_query.lower().split()) == " ".join(message.lower().split()):
+            return await original_task
+
+        rewritten_task = asyncio.create_task(retrieve_filtered(search_query, selected_files))
+        try:
+            docs, degraded = await rewritten_task
+        except Exception as e:
+            print(f"Retrieval for rewritten query failed: {e}")
+            docs, degraded = [], True
+
+        if docs:
+            return docs, degraded
+
+        print(f"No relevant docs found for rewritten query. Using original: '{message}'")
+        return await original_task
+    finally:
+        for task in (original_task, rewritten_task):
+            if task is not None and not task.done():
+                task.cancel()
\ No newline at end of file
@@ -1,48 +1,159 @@
 import os
 import shutil
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from typing import List
-from src.ingestion.loader import load_file_with_docling
-from src.ingestion.splitter import split_documents
-from src.ingestion.vector_db import get_vector_store
+import asyncio
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Query
+from typing import List, Optional
+from config.schemas import UploadSessionRequest, CompleteUploadsRequest, BulkDeleteRequest
+from src.ingestion.registry import get_file_registry
+from src.ingestion.pipeline import delete_file_chunks, delete_files
+from src.ingestion.jobs import get_job_manager, QueueFullError
+from src.ingestion.uploads import get_upload_sessions, new_workdir, upload_path, spool_upload, UploadError, UploadOffsetError
 
 router = APIRouter()
 
 @router.get("/")
-def list_files():
-    store = get_vector_store()
-    data = store.get()
-    unique_files = set()
-    if data and 'metadatas' in data:
-        for m in data['metadatas']:
-            if m.get('filename'): unique_files.add(m['filename'])
-    return {"files": list(unique_files)}
+def list_files(offset: int = Query(0, ge=0), limit: int = Query(1000, ge=1, le=10000), search: Optional[str] = None):
+    """
+    Indexed files in filename order, a page at a time, from the file registry.
+    search matches a substring of the filename.
+    """
+    records, total = get_file_registry().list(offset=offset, limit=limit, search=search)
+    return {"files": [r["filename"] for r in records], "total": total, "offset": offset, "limit": limit}
+
+@router.get("/{filename}")
+def get_file(filename: str):
+    record = get_file_registry().get(filename)
+    if record is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return record
 
 @router.delete("/{filename}")
 def delete_file(filename: str):
-    store = get_vector_store()
     try:
-        store._collection.delete(where={"filename": filename})
+        delete_file_chunks(filename)
         return {"status": "deleted", "filename": filename}
     except Exception as e:
         print(f"Error deleting file: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/upload")
-async def upload_files(files: List[UploadFile] = File(...)):
-    results = []
-    for file in files:
-        temp_path = f"temp_{file.filename}"
-        with open(temp_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+@router.post("/bulk-delete")
+def bulk_delete(request: BulkDeleteRequest):
+    """
+    Delete several files in one batch: a single vector store delete, one
+    keyword index save and one corpus version bump. Returns a status per file.
+    """
+    try:
+        results = delete_files(request.filenames)
+    except Exception as e:
+        print(f"Error deleting files: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"results": [{"filename": filename, "status": status} for filename, status in results.items()]}
+
+def queue_ingestion(saved, workdir, incremental):
+    try:
+        job = get_job_manager().submit(saved, workdir=workdir, incremental=incremental)
+    except QueueFullError as e:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "10"})
+    return {"job_id": job["id"], "files": [filename for _, filename, _ in saved]}
+
+def check_capacity(n_files):
+    try:
+        get_job_manager().check_capacity(n_files)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "10"})
+
+@router.post("/upload", status_code=202)
+async def upload_files(files: List[UploadFile] = File(...), incremental: bool = False):
+    """
+    Queue uploaded files for background ingestion and return a job id right away.
+    Files are streamed to a private temp directory and hashed on the way, so a
+    byte-identical re-upload is skipped before conversion. With incremental=true,
+    a changed file only has its changed pages converted and re-indexed.
+    """
+    check_capacity(len(files))
+    filenames = [os.path.basename(file.filename or "") for file in files]
+    if not all(filenames):
+        raise HTTPException(status_code=400, detail="Every uploaded file needs a filename.")
+
+    workdir = await asyncio.to_thread(new_workdir)
+    saved = []
+    try:
+        for index, (file, filename) in enumerate(zip(files, filenames)):
+            temp_path = await asyncio.to_thread(upload_path, workdir, index, filename)
+            _, content_hash = await spool_upload(file, temp_path)
+            saved.append((temp_path, filename, content_hash))
+    except UploadError as e:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise HTTPException(status_code=413, detail=str(e))
+
+    return queue_ingestion(saved, workdir, incremental)
+
+@router.post("/uploads", status_code=201)
+def create_upload(request: UploadSessionRequest):
+    """
+    Start a resumable upload. Send the bytes with PUT /uploads/{upload_id}?offset=N.
+    """
+    if not os.path.basename(request.filename):
+        raise HTTPException(status_code=400, detail="The upload needs a filename.")
+    try:
+        return get_upload_sessions().create(request.filename, request.size)
+    except UploadError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+@router.get("/uploads/{upload_id}")
+def get_upload(upload_id: str):
+    """
+    Current offset of a resumable upload, i.e. where to resume from.
+    """
+    try:
+        return get_upload_sessions().status(upload_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+
+@router.put("/uploads/{upload_id}")
+async def append_upload(upload_id: str, offset: int, request: Request):
+    """
+    Append the raw request body at offset. A mismatched offset returns 409
+    with the offset the server has.
+    """
+    try:
+        new_offset = await get_upload_sessions().append(upload_id, offset, request.stream())
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except UploadOffsetError as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "offset": e.offset})
+    except UploadError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return {"upload_id": upload_id, "offset": new_offset}
+
+@router.post("/uploads/complete", status_code=202)
+async def complete_uploads(request: CompleteUploadsRequest):
+    """
+    Queue finished resumable uploads as one ingestion job
+    """
+    check_capacity(len(request.upload_ids))
+
+    # Check every upload before moving any, so a bad id doesn't lose the others
+    sessions = get_upload_sessions()
+    for upload_id in request.upload_ids:
         try:
-            raw_docs = load_file_with_docling(temp_path)
-            for doc in raw_docs: doc.metadata["filename"] = file.filename
-            chunks = split_documents(raw_docs)
-            if chunks:
-                store = get_vector_store()
-                store.add_documents(chunks)
-                results.append(file.filename)
-        finally:
-            if os.path.exists(temp_path): os.remove(temp_path)
-    return {"uploaded": results}
\ No newline at end of file
+            status = sessions.status(upload_id)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"Upload {upload_id} not found")
+        if status["offset"] != status["size"]:
+            raise HTTPException(
+                status_code=409,
+                detail={"message": f"Upload {upload_id} is incomplete.", "offset": status["offset"]},
+            )
+
+    workdir = await asyncio.to_thread(new_workdir)
+    saved = [await asyncio.to_thread(sessions.finish, upload_id, workdir) for upload_id in request.upload_ids]
+    return queue_ingestion(saved, workdir, request.incremental)
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
\ No newline at end of file
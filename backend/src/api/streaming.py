@@ -0,0 +1,105 @@
+import json
+import time
+import asyncio
+from fastapi.responses import StreamingResponse
+from config.settings import settings
+from src import metrics
+
+async def wait_for_disconnect(request):
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+async def cancel_on_disconnect(request, frames):
+    """
+    Relays an async generator of frames until the client goes away, then
+    cancels the generator wherever it is waiting (LLM stream, retrieval, queue)
+    instead of letting it run to the end for nobody.
+    """
+    disconnected = asyncio.create_task(wait_for_disconnect(request))
+    step = None
+    try:
+        while True:
+            step = asyncio.ensure_future(frames.__anext__())
+            await asyncio.wait({step, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if not step.done():
+                return
+            try:
+                frame = step.result()
+            except StopAsyncIteration:
+                return
+            yield frame
+    finally:
+        disconnected.cancel()
+        if step is not None and not step.done():
+            metrics.increment("chat.cancelled")
+            print("Client disconnected, answer cancelled.")
+            step.cancel()
+            await asyncio.gather(step, return_exceptions=True)
+        await frames.aclose()
+
+async def coalesce_content(events, interval, max_chars):
+    """
+    Merges consecutive content events into one, flushing after interval
+    seconds or max_chars characters, and before any other event, so clients
+    get a few frames per second instead of one per token.
+    """
+    buffer, first_at, step = [], None, None
+    try:
+        while True:
+            if step is None:
+                step = asyncio.ensure_future(events.__anext__())
+            timeout = None if first_at is None else max(0.0, first_at + interval - time.perf_counter())
+            await asyncio.wait({step}, timeout=timeout)
+
+            if not step.done():
+                # The model paused: send what we have and keep waiting
+                yield {"type": "content", "data": "".join(buffer)}
+                buffer, first_at = [], None
+                continue
+
+            try:
+                event = step.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                step = None
+
+            if event["type"] == "content":
+                buffer.append(event["data"])
+                first_at = first_at or time.perf_counter()
+                if sum(map(len, buffer)) < max_chars and time.perf_counter() - first_at < interval:
+                    continue
+                event = None
+            if buffer:
+                yield {"type": "content", "data": "".join(buffer)}
+                buffer, first_at = [], None
+            if event is not None:
+                yield event
+        if buffer:
+            yield {"type": "content", "data": "".join(buffer)}
+    finally:
+        if step is not None and not step.done():
+            step.cancel()
+            await asyncio.gather(step, return_exceptions=True)
+        await events.aclose()
+
+def encode_ndjson(event):
+    return json.dumps(event) + "\n"
+
+def encode_sse(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+def event_stream(request, events):
+    """
+    Streaming response for chat events: coalesced content, cancelled on
+    disconnect, encoded as NDJSON or, if the client accepts
+    text/event-stream, as server-sent events.
+    """
+    frames = cancel_on_disconnect(request, coalesce_content(
+        events, settings.STREAM_FLUSH_INTERVAL_MS / 1000, settings.STREAM_FLUSH_CHARS
+    ))
+    if "text/event-stream" in request.headers.get("accept", ""):
+        body = (encode_sse(event) async for event in frames)
+        return StreamingResponse(body, media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    return StreamingResponse((encode_ndjson(event) async for event in frames), media_type="application/x-ndjson")
@@ -0,0 +1,58 @@
+import time
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    '''
+    Thread-safe LRU cache with an optional time-to-live per entry
+    '''
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+
+            expires_at, value = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def items(self):
+        '''
+        Snapshot of live entries, least recently used first
+        '''
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (key, value) for key, (expires_at, value) in self._data.items()
+                if expires_at is None or expires_at >= now
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
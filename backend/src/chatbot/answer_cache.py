@@ -0,0 +1,111 @@
+import time
+import threading
+import itertools
+import numpy as np
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from config.settings import settings
+from src.ingestion.corpus import get_corpus_version
+from src import metrics
+
+@dataclass
+class CachedAnswer:
+    question: str
+    embedding: np.ndarray
+    scope: tuple
+    sources: list
+    content: str
+    generation_seconds: float
+    created_at: float = field(default_factory=time.monotonic)
+    hits: int = 0
+
+class AnswerCache:
+    '''
+    Semantic cache of full RAG answers for history-free questions.
+    A question hits when its embedding is within max_distance (cosine) of a
+    cached question asked against the same file scope and corpus version.
+    '''
+    def __init__(self, maxsize, max_distance, ttl=None):
+        self.maxsize = maxsize
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self._entries = OrderedDict()   # entry id -> CachedAnswer, least recently used first
+        self._by_scope = {}             # scope -> set of entry ids
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def scope(file_filters=None, version=None):
+        version = get_corpus_version() if version is None else version
+        return (tuple(sorted(file_filters or [])), version)
+
+    def lookup(self, embedding, scope):
+        with self._lock:
+            self._expire()
+            ids = list(self._by_scope.get(scope, ()))
+            if not ids:
+                metrics.increment("answer_cache.misses")
+                return None
+
+            matrix = np.stack([self._entries[i].embedding for i in ids])
+            similarities = matrix @ np.asarray(embedding, dtype=np.float32)
+            best = int(np.argmax(similarities))
+            distance = 1.0 - float(similarities[best])
+            if distance > self.max_distance:
+                metrics.increment("answer_cache.misses")
+                return None
+
+            entry_id = ids[best]
+            entry = self._entries[entry_id]
+            self._entries.move_to_end(entry_id)
+            entry.hits += 1
+
+        metrics.increment("answer_cache.hits")
+        metrics.observe("answer_cache.saved_generation", entry.generation_seconds)
+        print(f"Answer cache hit (distance {distance:.4f}, hit #{entry.hits}) for '{entry.question}'")
+        return entry
+
+    def store(self, question, embedding, scope, sources, content, generation_seconds):
+        entry = CachedAnswer(
+            question=question,
+            embedding=np.asarray(embedding, dtype=np.float32),
+            scope=scope,
+            sources=sources,
+            content=content,
+            generation_seconds=generation_seconds,
+        )
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = entry
+            self._by_scope.setdefault(scope, set()).add(entry_id)
+            while len(self._entries) > self.maxsize:
+                self._evict(next(iter(self._entries)))
+        metrics.increment("answer_cache.stores")
+
+    def _expire(self):
+        if not self.ttl:
+            return
+        cutoff = time.monotonic() - self.ttl
+        for entry_id in [i for i, e in self._entries.items() if e.created_at < cutoff]:
+            self._evict(entry_id)
+
+    def _evict(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        ids = self._by_scope.get(entry.scope)
+        if ids is not None:
+            ids.discard(entry_id)
+            if not ids:
+                del self._by_scope[entry.scope]
+        metrics.increment("answer_cache.evictions")
+
+@lru_cache(maxsize=1)
+def get_answer_cache():
+    return AnswerCache(
+        maxsize=settings.ANSWER_CACHE_SIZE,
+        max_distance=settings.ANSWER_CACHE_MAX_DISTANCE,
+        ttl=settings.ANSWER_CACHE_TTL or None,
+    )
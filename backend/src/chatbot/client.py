@@ -1,15 +1,80 @@
+import time
+import httpx
+from functools import lru_cache
 from langchain_ollama import ChatOllama
 from config.settings import settings
+from src import metrics
 
+def ollama_limits():
+    return httpx.Limits(
+        max_connections=settings.OLLAMA_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.OLLAMA_MAX_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_SECS,
+    )
+
+def ollama_timeout():
+    # Generation can legitimately take minutes; connecting should not
+    return httpx.Timeout(settings.OLLAMA_TIMEOUT, connect=settings.OLLAMA_CONNECT_TIMEOUT)
+
+@lru_cache(maxsize=2)
 def get_llm(streaming):
     """
-    Connects to the Fine-Tuned Reasoning Model in Ollama
+    Connects to the Fine-Tuned Reasoning Model in Ollama.
+    One client per process (and mode), so HTTP connections to Ollama are
+    pooled and kept alive. Failed connection attempts are retried.
     """
     llm = ChatOllama(
         base_url=settings.OLLAMA_URL,
         model=settings.LLM_MODEL_NAME,
         temperature=0.2,
         keep_alive="1h",
-        streaming=streaming
+        streaming=streaming,
+        client_kwargs={"timeout": ollama_timeout()},
+        sync_client_kwargs={"transport": httpx.HTTPTransport(retries=settings.OLLAMA_RETRIES, limits=ollama_limits())},
+        async_client_kwargs={"transport": httpx.AsyncHTTPTransport(retries=settings.OLLAMA_RETRIES, limits=ollama_limits())},
     )
-    return llm
\ No newline at end of file
+    return llm
+
+@lru_cache(maxsize=1)
+def get_ollama_http():
+    """
+    Shared HTTP client for Ollama's management API (model list, pulls, health)
+    """
+    return httpx.AsyncClient(
+        base_url=settings.OLLAMA_URL,
+        timeout=ollama_timeout(),
+        transport=httpx.AsyncHTTPTransport(retries=settings.OLLAMA_RETRIES, limits=ollama_limits()),
+    )
+
+async def ollama_health():
+    start = time.perf_counter()
+    try:
+        response = await get_ollama_http().get("/api/tags", timeout=settings.OLLAMA_CONNECT_TIMEOUT)
+        response.raise_for_status()
+        return {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+    except Exception as e:
+        return {"ok": False, "error": str(e) or type(e).__name__}
+
+def record_llm_usage(metadata, stage="chat"):
+    """
+    Records Ollama's token counts and timings for one call.
+    prompt_eval_count only covers prompt tokens that were not served from the
+    server's prompt cache, so it measures prefill work actually done.
+    Returns the counts, or None if the response carried no metadata.
+    """
+    if not metadata or metadata.get("prompt_eval_count") is None:
+        return None
+
+    usage = {
+        "prompt_eval_count": metadata.get("prompt_eval_count", 0),
+        "prompt_eval_ms": metadata.get("prompt_eval_duration", 0) / 1e6,
+        "eval_count": metadata.get("eval_count", 0),
+        "eval_ms": metadata.get("eval_duration", 0) / 1e6,
+    }
+    metrics.increment(f"llm.{stage}.calls")
+    metrics.increment(f"llm.{stage}.prompt_eval_tokens", usage["prompt_eval_count"])
+    metrics.increment(f"llm.{stage}.eval_tokens", usage["eval_count"])
+    metrics.observe(f"llm.{stage}.prompt_eval", usage["prompt_eval_ms"] / 1000)
+    print(f"LLM {stage}: {usage['prompt_eval_count']} prompt tokens evaluated in {usage['prompt_eval_ms']:.0f} ms, "
+          f"{usage['eval_count']} generated")
+    return usage
\ No newline at end of file
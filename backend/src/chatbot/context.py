@@ -0,0 +1,169 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from langchain_core.documents import Document
+from config.settings import settings
+from src.chatbot.dedup import dedup_documents
+from src import metrics
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+MIN_OVERLAP_CHARS = 30
+SEPARATOR = "\n\n"
+
+@lru_cache(maxsize=1)
+def get_llm_tokenizer():
+    '''
+    Tokenizer matching LLM_MODEL_NAME, if LLM_TOKENIZER_NAME names one.
+    Otherwise token counts are estimated from characters.
+    '''
+    if not settings.LLM_TOKENIZER_NAME:
+        return None
+    try:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(settings.LLM_TOKENIZER_NAME)
+        tokenizer.model_max_length = 10 ** 9    # only used for counting
+        return tokenizer
+    except Exception as e:
+        print(f"LLM tokenizer '{settings.LLM_TOKENIZER_NAME}' unavailable, estimating tokens: {e}")
+        return None
+
+def count_llm_tokens(text):
+    tokenizer = get_llm_tokenizer()
+    if tokenizer is None:
+        return int(len(text) / settings.CONTEXT_CHARS_PER_TOKEN) + 1
+    return len(tokenizer.encode(text, add_special_tokens=False))
+
+def page_span(doc):
+    start = doc.metadata.get("page_start", doc.metadata.get("page_number"))
+    end = doc.metadata.get("page_end", start)
+    return start, end
+
+def overlap_length(a, b):
+    '''
+    Length of the longest suffix of a that is also a prefix of b (0 if under MIN_OVERLAP_CHARS)
+    '''
+    probe = b[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    start = a.find(probe, max(0, len(a) - len(b)))
+    while start != -1:
+        if b.startswith(a[start:]):
+            return len(a) - start
+        start = a.find(probe, start + 1)
+    return 0
+
+def merge_pair(a, b):
+    '''
+    Merge two chunks of the same file when one contains the other or they
+    overlap at the edges. Returns the merged Document or None.
+    '''
+    if a.metadata.get("filename") != b.metadata.get("filename"):
+        return None
+    (a_start, a_end), (b_start, b_end) = page_span(a), page_span(b)
+    if None not in (a_start, b_start) and (a_start > b_end + 1 or b_start > a_end + 1):
+        return None
+
+    text_a, text_b = a.page_content.strip(), b.page_content.strip()
+    if text_b in text_a:
+        return a
+    if text_a in text_b:
+        return b
+
+    for first, second in ((text_a, text_b), (text_b, text_a)):
+        if n := overlap_length(first, second):
+            text = first + second[n:]
+            break
+    else:
+        return None
+
+    metadata = dict(a.metadata)
+    if None not in (a_start, b_start):
+        metadata.update({"page_number": min(a_start, b_start), "page_start": min(a_start, b_start),
+                         "page_end": max(a_end, b_end)})
+    metadata["relevance_score"] = max(a.metadata.get("relevance_score", 0.0), b.metadata.get("relevance_score", 0.0))
+    return Document(page_content=text, metadata=metadata, id=a.id)
+
+def merge_overlapping(docs):
+    '''
+    Collapse chunks that overlap or contain each other, keeping the better rank
+    '''
+    merged = []
+    for doc in docs:
+        for i, kept in enumerate(merged):
+            if (combined := merge_pair(kept, doc)) is not None:
+                merged[i] = combined
+                break
+        else:
+            merged.append(doc)
+    return merged
+
+def truncate_to_tokens(text, max_tokens):
+    '''
+    Longest run of whole sentences from the start of text that fits in max_tokens
+    '''
+    kept = []
+    for sentence in SENTENCE_END.split(text):
+        if count_llm_tokens(" ".join(kept + [sentence])) > max_tokens:
+            break
+        kept.append(sentence)
+    return " ".join(kept)
+
+@dataclass
+class PackedContext:
+    text: str
+    docs: list          # the chunks that made it into the context, in context order
+    tokens: int
+    original_tokens: int
+
+    @property
+    def tokens_saved(self):
+        return max(0, self.original_tokens - self.tokens)
+
+def build_context(docs, budget=None):
+    '''
+    Assemble the prompt context from reranked chunks: merge overlapping chunks
+    of the same file, drop near-duplicates, keep the best chunks that fit in the
+    token budget (cutting the last one at a sentence if worthwhile) and order
+    them by file and page so neighbouring passages read in sequence.
+    '''
+    budget = budget or settings.CONTEXT_TOKEN_BUDGET
+    original_tokens = count_llm_tokens(SEPARATOR.join(d.page_content for d in docs))
+
+    candidates = dedup_documents(merge_overlapping(docs), threshold=settings.RETRIEVAL_DEDUP_THRESHOLD)
+
+    selected, used = [], 0
+    for rank, doc in enumerate(candidates):
+        separator_tokens = 1 if selected else 0
+        tokens = count_llm_tokens(doc.page_content)
+        remaining = budget - used - separator_tokens
+        if tokens > remaining:
+            if remaining < settings.CONTEXT_MIN_PARTIAL_TOKENS:
+                continue
+            text = truncate_to_tokens(doc.page_content, remaining)
+            if not text:
+                continue
+            doc = Document(page_content=text, metadata=dict(doc.metadata), id=doc.id)
+            tokens = count_llm_tokens(text)
+        selected.append((rank, doc))
+        used += tokens + separator_tokens
+
+    # Files in order of their best chunk, chunks within a file in page order
+    file_rank = {}
+    for rank, doc in selected:
+        file_rank.setdefault(doc.metadata.get("filename"), rank)
+    selected.sort(key=lambda item: (
+        file_rank[item[1].metadata.get("filename")], page_span(item[1])[0] or 0, item[0]
+    ))
+
+    packed_docs = [doc for _, doc in selected]
+    text = SEPARATOR.join(d.page_content for d in packed_docs)
+    packed = PackedContext(text=text, docs=packed_docs, tokens=count_llm_tokens(text), original_tokens=original_tokens)
+
+    metrics.increment("context.requests")
+    metrics.increment("context.tokens", packed.tokens)
+    metrics.increment("context.tokens_saved", packed.tokens_saved)
+    print(
+        f"Context: {len(docs)} chunks -> {len(packed_docs)} blocks, "
+        f"{packed.tokens}/{budget} tokens ({packed.tokens_saved} saved)"
+    )
+    return packed
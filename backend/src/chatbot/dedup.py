@@ -0,0 +1,41 @@
+import re
+
+WORD_PATTERN = re.compile(r"\w+")
+
+def shingles(text, size=5):
+    '''
+    Set of word n-grams used to compare chunk texts
+    '''
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) <= size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def overlap_ratio(a, b):
+    '''
+    Share of the smaller shingle set that also appears in the other one.
+    1.0 means one chunk is fully contained in the other.
+    '''
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+def dedup_documents(docs, threshold=0.8):
+    '''
+    Collapse exact and heavily overlapping chunks, keeping the first
+    (highest ranked) occurrence. Returns the kept documents in order.
+    '''
+    kept, kept_shingles, seen_text = [], [], set()
+    for doc in docs:
+        text = doc.page_content.strip()
+        if text in seen_text:
+            continue
+
+        doc_shingles = shingles(text)
+        if any(overlap_ratio(doc_shingles, other) >= threshold for other in kept_shingles):
+            continue
+
+        kept.append(doc)
+        kept_shingles.append(doc_shingles)
+        seen_text.add(text)
+    return kept
@@ -0,0 +1,84 @@
+import re
+import asyncio
+import hashlib
+from functools import lru_cache
+from config.settings import settings
+from src.cache import LRUCache
+from src.chatbot.rag_chains import get_query_transform_chain
+from src import metrics
+
+# Words that usually point back at something said earlier in the conversation
+REFERRING_WORDS = {
+    "it", "its", "it's", "itself", "they", "them", "their", "theirs", "this", "that",
+    "these", "those", "he", "him", "his", "she", "her", "hers", "former", "latter",
+    "above", "previous", "same", "there", "then", "one", "ones",
+}
+
+# Openers of elliptical follow-ups ("what about ...", "and the second one?")
+FOLLOW_UP_OPENERS = (
+    "what about", "how about", "and ", "also", "but ", "why", "so ", "then",
+    "more", "continue", "elaborate", "explain more", "give an example", "example",
+    "tell me more", "go on", "what else", "same",
+)
+
+WORD_PATTERN = re.compile(r"[\w']+")
+
+def needs_rewrite(message):
+    '''
+    Cheap local check for whether a message depends on the chat history.
+    Standalone questions ("What is a B-tree?") skip the rewrite LLM call.
+    '''
+    text = message.strip().lower()
+    words = WORD_PATTERN.findall(text)
+    if len(words) <= 2 or text.endswith("..."):
+        return True
+    if text.startswith(FOLLOW_UP_OPENERS):
+        return True
+    return any(w in REFERRING_WORDS for w in words)
+
+def history_window(langchain_history):
+    '''
+    The most recent turns, which is all the rewrite chain gets to see
+    '''
+    return langchain_history[-settings.REWRITE_HISTORY_WINDOW:]
+
+def rewrite_cache_key(message, window):
+    digest = hashlib.sha256()
+    for msg in window:
+        digest.update(f"{msg.type}\x00{msg.content}\x1e".encode("utf-8"))
+    digest.update(" ".join(message.lower().split()).encode("utf-8"))
+    return digest.hexdigest()
+
+@lru_cache(maxsize=1)
+def get_rewrite_cache():
+    return LRUCache(maxsize=settings.REWRITE_CACHE_SIZE, ttl=settings.REWRITE_CACHE_TTL)
+
+async def rewrite_query(message, langchain_history):
+    """
+    Turns a follow-up into a standalone query.
+    Skips the LLM for standalone messages and reuses cached rewrites.
+    """
+    metrics.increment("rewrite.requests")
+    if not needs_rewrite(message):
+        metrics.increment("rewrite.skipped")
+        return message
+
+    window = history_window(langchain_history)
+    key = rewrite_cache_key(message, window)
+    cache = get_rewrite_cache()
+    if (cached := cache.get(key)) is not None:
+        metrics.increment("rewrite.cache_hits")
+        print(f"Rewritten Query (cached): '{cached}'")
+        return cached
+
+    metrics.increment("rewrite.llm_calls")
+    rewrite_chain = get_query_transform_chain()
+    with metrics.timer("rewrite"):
+        search_query = await asyncio.to_thread(
+            rewrite_chain.invoke,
+            {"chat_history": window, "input": message}
+        )
+    search_query = search_query.strip() or message
+    cache.set(key, search_query)
+    print(f"Rewritten Query: '{search_query}'")
+    return search_query
@@ -1,5 +1,6 @@
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder, FewShotChatMessagePromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from config.settings import settings
 from src.chatbot.client import get_llm
 from src.utils import load_prompts
 
@@ -8,18 +9,27 @@ PROMPTS = load_prompts()
 def get_chat_chain():
     """
     Chain for answering questions based on context.
+    Streams message chunks so the LLM's response metadata (prompt-eval counts) stays available.
+    In the prefix_stable layout the system prompt never changes and the context
+    travels with the question at the end, so system prompt + history form a
+    prefix the LLM server can reuse from its cache on the next turn.
     """
     llm = get_llm(streaming=True)
     
-    system_prompt = PROMPTS["rag_system_prompt"]
+    if settings.PROMPT_LAYOUT == "prefix_stable":
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", PROMPTS["rag_system_prompt_stable"]),
+            MessagesPlaceholder("chat_history"),
+            ("human", PROMPTS["rag_question_template"])
+        ])
+    else:
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", PROMPTS["rag_system_prompt"]),
+            MessagesPlaceholder("chat_history"),
+            ("human", "{input}")
+        ])
     
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
-        MessagesPlaceholder("chat_history"),
-        ("human", "{input}")
-    ])
-    
-    return prompt | llm | StrOutputParser()
+    return prompt | llm
 
 def get_query_transform_chain():
     """
@@ -47,4 +57,17 @@ def get_query_transform_chain():
         ("human", "{input}"),
     ])
     
+    return prompt | llm | StrOutputParser()
+
+def get_summary_chain():
+    """
+    Chain for folding older conversation turns into a running summary.
+    """
+    llm = get_llm(streaming=False)
+
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", PROMPTS["history_summary_prompt"]),
+        ("human", "Current summary:\n{summary}\n\nNew turns:\n{turns}")
+    ])
+
     return prompt | llm | StrOutputParser()
\ No newline at end of file
@@ -0,0 +1,86 @@
+import os
+import time
+import hashlib
+from functools import lru_cache
+from typing import Any
+from flashrank import Ranker, RerankRequest
+from langchain_core.documents import BaseDocumentCompressor, Document
+from config.settings import settings
+from src.cache import LRUCache
+from src.ingestion.corpus import get_corpus_version
+from src import metrics
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+def chunk_id(doc):
+    '''
+    Stable identifier for a chunk: its store id, or a hash of its text
+    '''
+    return doc.id or hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+
+class CachedReranker(BaseDocumentCompressor):
+    """
+    Cross-encoder reranker that scores in CPU-sized batches and remembers
+    scores per (normalized query, chunk id, corpus version).
+    """
+    client: Any
+    cache: Any
+    top_n: int = 5
+    batch_size: int = 16
+
+    def compress_documents(self, documents, query, callbacks=None):
+        if not documents:
+            return []
+
+        start = time.perf_counter()
+        version = get_corpus_version()
+        norm_query = normalize_query(query)
+
+        keys = [(norm_query, chunk_id(d), version) for d in documents]
+        scores = [self.cache.get(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+
+        for batch_start in range(0, len(missing), self.batch_size):
+            batch = missing[batch_start:batch_start + self.batch_size]
+            passages = [{"id": i, "text": documents[i].page_content} for i in batch]
+            for result in self.client.rerank(RerankRequest(query=query, passages=passages)):
+                i = result["id"]
+                scores[i] = float(result["score"])
+                self.cache.set(keys[i], scores[i])
+
+        ranked = sorted(zip(documents, scores), key=lambda item: item[1], reverse=True)[:self.top_n]
+        results = [
+            Document(
+                page_content=doc.page_content,
+                metadata={**doc.metadata, "relevance_score": score},
+                id=doc.id,
+            )
+            for doc, score in ranked
+        ]
+
+        elapsed = time.perf_counter() - start
+        metrics.observe("rerank", elapsed)
+        metrics.increment("rerank.cache_hits", len(documents) - len(missing))
+        metrics.increment("rerank.scored", len(missing))
+        print(f"Rerank: {len(missing)} scored, {len(documents) - len(missing)} cached in {elapsed * 1000:.1f} ms")
+        return results
+
+def default_batch_size():
+    '''
+    Batch size for cross-encoder scoring, scaled with the available cores
+    '''
+    return settings.RERANK_BATCH_SIZE or min(32, 4 * (os.cpu_count() or 1))
+
+@lru_cache(maxsize=1)
+def get_reranker():
+    """
+    Returns the process-wide reranker.
+    Cached so the cross-encoder is loaded once instead of on every request.
+    """
+    return CachedReranker(
+        client=Ranker(model_name=settings.RERANK_MODEL_NAME),
+        cache=LRUCache(maxsize=settings.RERANK_CACHE_SIZE),
+        top_n=5,
+        batch_size=default_batch_size(),
+    )
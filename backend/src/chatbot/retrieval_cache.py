@@ -0,0 +1,87 @@
+import os
+import pickle
+from functools import lru_cache
+from config.settings import settings
+from src.cache import LRUCache
+from src.chatbot.reranker import normalize_query, chunk_id
+from src.ingestion.bm25_index import get_bm25_index
+from src.ingestion.corpus import get_corpus_version
+from src import metrics
+
+class RetrievalCache:
+    '''
+    Remembers the reranked, threshold-filtered chunks for a
+    (normalized query, file scope, corpus version). Only chunk ids and scores
+    are stored; the chunks themselves are read back from the BM25 index, so a
+    hit skips embedding, both searches and the reranker.
+    '''
+    def __init__(self, maxsize):
+        self._cache = LRUCache(maxsize=maxsize)
+
+    def __len__(self):
+        return len(self._cache)
+
+    def key(self, query, file_filters=None):
+        return (normalize_query(query), tuple(sorted(file_filters or [])), get_corpus_version())
+
+    def lookup(self, key):
+        entry = self._cache.get(key)
+        if entry is None:
+            metrics.increment("retrieval_cache.misses")
+            return None
+
+        index = get_bm25_index()
+        docs = []
+        for filename, cid, score in entry:
+            doc = index.get_document(filename, cid)
+            if doc is None:
+                metrics.increment("retrieval_cache.misses")
+                return None
+            doc.metadata["relevance_score"] = score
+            docs.append(doc)
+
+        metrics.increment("retrieval_cache.hits")
+        return docs
+
+    def store(self, key, docs):
+        self._cache.set(key, [
+            (d.metadata.get("filename"), chunk_id(d), d.metadata.get("relevance_score", 0.0))
+            for d in docs
+        ])
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self._cache.items(), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        '''
+        Restore entries saved by a previous process, dropping those built
+        against an older corpus version
+        '''
+        with open(path, "rb") as f:
+            items = pickle.load(f)
+        version = get_corpus_version()
+        for key, value in items:
+            if key[2] == version:
+                self._cache.set(key, value)
+
+@lru_cache(maxsize=1)
+def get_retrieval_cache():
+    """
+    Returns the process-wide retrieval cache, restored from disk when persistence is enabled.
+    """
+    cache = RetrievalCache(maxsize=settings.RETRIEVAL_CACHE_SIZE)
+    path = settings.RETRIEVAL_CACHE_PATH
+    if path and os.path.exists(path):
+        try:
+            cache.load(path)
+        except Exception as e:
+            print(f"Failed to load retrieval cache from {path}: {e}")
+    return cache
+
+def save_retrieval_cache():
+    if settings.RETRIEVAL_CACHE_PATH:
+        get_retrieval_cache().save(settings.RETRIEVAL_CACHE_PATH)
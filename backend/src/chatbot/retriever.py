@@ -1,8 +1,101 @@
-from langchain_community.retrievers import BM25Retriever
-from langchain_community.document_compressors import FlashrankRerank
-from langchain_classic.retrievers import ContextualCompressionRetriever, EnsembleRetriever
-from langchain_core.documents import Document
+import asyncio
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, List, Optional
+from langchain_classic.retrievers import ContextualCompressionRetriever
+from langchain_core.retrievers import BaseRetriever
+from config.settings import settings
 from src.ingestion.vector_db import get_vector_store
+from src.ingestion.bm25_index import get_bm25_index
+from src.chatbot.reranker import get_reranker, chunk_id
+from src.chatbot.dedup import dedup_documents
+from src import metrics
+
+@lru_cache(maxsize=1)
+def get_retrieval_executor():
+    """
+    One fixed-size pool for the sync retrieval path, so legs that time out
+    cannot pile up threads under load.
+    """
+    return ThreadPoolExecutor(max_workers=settings.RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+
+class BM25IndexRetriever(BaseRetriever):
+    """
+    Keyword retriever backed by the persistent, process-wide BM25 index.
+    """
+    index: Any
+    k: int = 10
+    file_filters: Optional[List[str]] = None
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        return self.index.search(query, k=self.k, file_filters=self.file_filters)
+
+class HybridRetriever(BaseRetriever):
+    """
+    Runs every retrieval leg concurrently with a per-leg timeout, fuses the
+    ranked lists with weighted reciprocal-rank fusion, and collapses duplicate
+    or heavily overlapping chunks before they reach the reranker.
+    Legs that failed or timed out in the last search are listed in failed_legs.
+    """
+    retrievers: List[BaseRetriever]
+    names: List[str]
+    weights: List[float]
+    c: int = 60
+    leg_timeout: float = 5.0
+    dedup_threshold: float = 0.8
+    failed_legs: List[str] = []
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        self.failed_legs = []
+        pool = get_retrieval_executor()
+        futures = [pool.submit(self._run_leg, name, r, query) for name, r in zip(self.names, self.retrievers)]
+        results = []
+        for name, future in zip(self.names, futures):
+            try:
+                results.append(future.result(timeout=self.leg_timeout))
+            except FutureTimeoutError:
+                results.append(self._leg_failed(name, "timed out"))
+            except Exception as e:
+                results.append(self._leg_failed(name, e))
+        return self._fuse(results)
+
+    async def _aget_relevant_documents(self, query, *, run_manager):
+        self.failed_legs = []
+        results = await asyncio.gather(*[
+            self._arun_leg(name, r, query) for name, r in zip(self.names, self.retrievers)
+        ])
+        return self._fuse(results)
+
+    def _run_leg(self, name, retriever, query):
+        with metrics.timer(f"retrieval.{name}"):
+            return retriever.invoke(query)
+
+    async def _arun_leg(self, name, retriever, query):
+        try:
+            return await asyncio.wait_for(asyncio.to_thread(self._run_leg, name, retriever, query), self.leg_timeout)
+        except asyncio.TimeoutError:
+            return self._leg_failed(name, "timed out")
+        except Exception as e:
+            return self._leg_failed(name, e)
+
+    def _leg_failed(self, name, reason):
+        print(f"Retrieval leg '{name}' failed: {reason}")
+        metrics.increment(f"retrieval.{name}.failures")
+        self.failed_legs.append(name)
+        return []
+
+    def _fuse(self, results):
+        scores, docs = {}, {}
+        for weight, leg_docs in zip(self.weights, results):
+            for rank, doc in enumerate(leg_docs, start=1):
+                key = chunk_id(doc)
+                scores[key] = scores.get(key, 0.0) + weight / (self.c + rank)
+                docs.setdefault(key, doc)
+
+        fused = [docs[key] for key in sorted(scores, key=scores.get, reverse=True)]
+        deduped = dedup_documents(fused, threshold=self.dedup_threshold)
+        metrics.increment("retrieval.duplicates_removed", len(fused) - len(deduped))
+        return deduped
 
 def get_retriever_chain(file_filters=None):
     """
@@ -23,34 +116,25 @@ def get_retriever_chain(file_filters=None):
 
     try:
         # Configure BM25 (Keyword) Search with Filters
-        data = vector_store.get() 
-        if not data or not data['documents']:
-            return None
-            
-        doc_objects = []
-        for t, m in zip(data['documents'], data['metadatas']):
-            if file_filters and m.get("filename") not in file_filters:
-                continue
-            doc_objects.append(Document(page_content=t, metadata=m))
-        
-        if not doc_objects:
+        bm25_index = get_bm25_index()
+        if not bm25_index.has_files(file_filters):
             return None
 
-        bm25_retriever = BM25Retriever.from_documents(doc_objects)
-        bm25_retriever.k = 10
+        bm25_retriever = BM25IndexRetriever(index=bm25_index, k=10, file_filters=file_filters or None)
         
-        # Combine those 2 search with weights (0.3/0.7)
-        ensemble_retriever = EnsembleRetriever(
+        # Run those 2 search concurrently and fuse with weights (0.3/0.7)
+        hybrid_retriever = HybridRetriever(
             retrievers=[bm25_retriever, base_vector_retriever],
-            weights=[0.3, 0.7]
+            names=["bm25", "vector"],
+            weights=[0.3, 0.7],
+            leg_timeout=settings.RETRIEVAL_LEG_TIMEOUT,
+            dedup_threshold=settings.RETRIEVAL_DEDUP_THRESHOLD
         )
         
         # Rerank the retrieval result
-        compressor = FlashrankRerank(model='ms-marco-MiniLM-L-12-v2', top_n=5)
-        
         final_retriever = ContextualCompressionRetriever(
-            base_compressor=compressor, 
-            base_retriever=ensemble_retriever
+            base_compressor=get_reranker(), 
+            base_retriever=hybrid_retriever
         )
         
         return final_retriever
@@ -59,6 +143,15 @@ def get_retriever_chain(file_filters=None):
         print(f"Hybrid Retriever initialization failed: {e}")
         return base_vector_retriever
     
+def retrieval_degraded(retriever):
+    """
+    True when the retriever's last search ran without every leg: one failed or
+    timed out, or the hybrid retriever could not be built. Such results should
+    not be cached.
+    """
+    hybrid = getattr(retriever, "base_retriever", None)
+    return not isinstance(hybrid, HybridRetriever) or bool(hybrid.failed_legs)
+
 def get_smart_display_name(doc):
     """
     Helper function to extract the best possible label for a document chunk.
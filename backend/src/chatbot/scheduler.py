@@ -0,0 +1,93 @@
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+from config.settings import settings
+from src import metrics
+
+class QueueFullError(Exception):
+    pass
+
+@dataclass(eq=False)
+class Ticket:
+    admitted: bool = False
+    changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+class GenerationScheduler:
+    '''
+    Admission control for answer generation. At most max_concurrent answers
+    run at once; up to max_queue more wait in FIFO order and are told their
+    position as it changes. Beyond that, requests are turned away.
+    '''
+    def __init__(self, max_concurrent, max_queue):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._active = 0
+        self._queue = deque()
+
+    def check_capacity(self):
+        if self._active >= self.max_concurrent and len(self._queue) >= self.max_queue:
+            raise QueueFullError(
+                f"Server is busy ({self._active} answers running, {len(self._queue)} queued). Try again shortly."
+            )
+
+    def enqueue(self):
+        ticket = Ticket()
+        if self._active < self.max_concurrent and not self._queue:
+            self._admit(ticket)
+            return ticket
+        if len(self._queue) >= self.max_queue:
+            metrics.increment("generation.rejected")
+            raise QueueFullError("Server is busy. Try again shortly.")
+        self._queue.append(ticket)
+        metrics.increment("generation.queued")
+        return ticket
+
+    def position(self, ticket):
+        '''
+        1-based place in the queue, 0 once admitted
+        '''
+        return 0 if ticket.admitted else self._queue.index(ticket) + 1
+
+    async def wait(self, ticket, position):
+        '''
+        Wait until the ticket is admitted or its queue position differs from position
+        '''
+        while self.position(ticket) == position:
+            ticket.changed.clear()
+            await ticket.changed.wait()
+
+    def release(self, ticket):
+        '''
+        Give back the slot, or leave the queue if the ticket was still waiting
+        '''
+        if ticket.admitted:
+            ticket.admitted = False
+            self._active -= 1
+        elif ticket in self._queue:
+            self._queue.remove(ticket)
+        self._dispatch()
+
+    def _admit(self, ticket):
+        ticket.admitted = True
+        self._active += 1
+        metrics.increment("generation.admitted")
+
+    def _dispatch(self):
+        while self._queue and self._active < self.max_concurrent:
+            ticket = self._queue.popleft()
+            self._admit(ticket)
+            ticket.changed.set()
+        # Everyone still waiting re-checks its position
+        for ticket in self._queue:
+            ticket.changed.set()
+
+    def stats(self):
+        return {"active": self._active, "queued": len(self._queue), "max_concurrent": self.max_concurrent}
+
+@lru_cache(maxsize=1)
+def get_generation_scheduler():
+    return GenerationScheduler(
+        max_concurrent=settings.GENERATION_MAX_CONCURRENT,
+        max_queue=settings.GENERATION_MAX_QUEUE,
+    )
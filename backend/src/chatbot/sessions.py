@@ -0,0 +1,115 @@
+import time
+import uuid
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from config.settings import settings
+from src.cache import LRUCache
+from src.chatbot.context import count_llm_tokens
+from src.chatbot.rag_chains import get_summary_chain
+from src import metrics
+
+@dataclass
+class ChatSession:
+    id: str
+    summary: str = ""
+    turns: deque = field(default_factory=deque)     # (role, content, tokens), oldest first
+    turn_tokens: int = 0                            # running total over turns
+    pending: list = field(default_factory=list)     # evicted turns not yet folded into the summary
+    summarizing: bool = False
+    created_at: float = field(default_factory=time.time)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+
+class SessionStore:
+    '''
+    Server-side chat history. Each session keeps its recent turns verbatim up to
+    SESSION_HISTORY_TOKENS; older turns are folded into a rolling summary by the
+    LLM in the background. Building the prompt history only touches the bounded
+    tail and the cached summary, never the whole conversation.
+    With rebase_tokens > 0, turns may pile up that far past the budget before
+    a whole block of them is summarized, so the history only ever grows at the
+    end between those rebases and the LLM server can reuse its cached prefix.
+    '''
+    def __init__(self, maxsize, ttl, history_tokens, rebase_tokens=0):
+        self.history_tokens = history_tokens
+        self.rebase_tokens = rebase_tokens
+        self._sessions = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._tasks = set()
+
+    def create(self):
+        session = ChatSession(id=uuid.uuid4().hex)
+        self._sessions.set(session.id, session)
+        metrics.increment("sessions.created")
+        return session
+
+    def get(self, session_id):
+        return self._sessions.get(session_id)
+
+    def delete(self, session_id):
+        return self._sessions.pop(session_id) is not None
+
+    def history(self, session):
+        '''
+        LangChain messages for the prompt: the summary, then turns awaiting
+        summarization, then the recent turns
+        '''
+        messages = []
+        if session.summary:
+            messages.append(SystemMessage(content=f"Summary of the earlier conversation:\n{session.summary}"))
+        for role, content, _ in [*session.pending, *session.turns]:
+            messages.append(HumanMessage(content=content) if role == "user" else AIMessage(content=content))
+        return messages
+
+    def append_turn(self, session, question, answer):
+        for role, content in (("user", question), ("assistant", answer)):
+            tokens = count_llm_tokens(content)
+            session.turns.append((role, content, tokens))
+            session.turn_tokens += tokens
+
+        # Keep at least the latest exchange verbatim
+        if session.turn_tokens > self.history_tokens + self.rebase_tokens:
+            while session.turn_tokens > self.history_tokens and len(session.turns) > 2:
+                turn = session.turns.popleft()
+                session.turn_tokens -= turn[2]
+                session.pending.append(turn)
+
+        # If summarization keeps failing, don't let the backlog grow without bound
+        backlog_tokens = self.history_tokens + self.rebase_tokens
+        while sum(t[2] for t in session.pending) > backlog_tokens and len(session.pending) > 1:
+            session.pending.pop(0)
+            metrics.increment("sessions.dropped_turns")
+
+        self._sessions.set(session.id, session)   # refresh LRU position and TTL
+        if session.pending and not session.summarizing:
+            session.summarizing = True
+            task = asyncio.create_task(self._summarize(session))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _summarize(self, session):
+        try:
+            while session.pending:
+                batch = list(session.pending)
+                transcript = "\n".join(f"{role.upper()}: {content}" for role, content, _ in batch)
+                with metrics.timer("sessions.summarize"):
+                    summary = await get_summary_chain().ainvoke({"summary": session.summary or "(none)", "turns": transcript})
+                session.summary = summary.strip()
+                summarized = {id(turn) for turn in batch}
+                session.pending = [turn for turn in session.pending if id(turn) not in summarized]
+                metrics.increment("sessions.summaries")
+        except Exception as e:
+            # The pending turns stay in the prompt verbatim and are retried after the next turn
+            print(f"Summarizing session {session.id} failed: {e}")
+        finally:
+            session.summarizing = False
+
+@lru_cache(maxsize=1)
+def get_session_store():
+    return SessionStore(
+        maxsize=settings.SESSION_MAX,
+        ttl=settings.SESSION_TTL or None,
+        history_tokens=settings.SESSION_HISTORY_TOKENS,
+        rebase_tokens=settings.SESSION_REBASE_TOKENS if settings.PROMPT_LAYOUT == "prefix_stable" else 0,
+    )
@@ -0,0 +1,289 @@
+import os
+import re
+import math
+import heapq
+import pickle
+import hashlib
+import threading
+from collections import defaultdict
+from functools import lru_cache
+from langchain_core.documents import Document
+from config.settings import settings
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+def tokenize(text):
+    '''
+    Lowercase word tokenizer shared by indexing and querying
+    '''
+    return TOKEN_PATTERN.findall(text.lower())
+
+class BM25Shard:
+    '''
+    Postings and document lengths for the chunks of a single file
+    '''
+    def __init__(self, filename):
+        self.filename = filename
+        self.docs = {}                      # chunk id -> (text, metadata)
+        self.doc_lens = {}                  # chunk id -> token count
+        self.postings = defaultdict(dict)   # term -> {chunk id: term frequency}
+        self.total_len = 0
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, chunk_id, doc):
+        tokens = tokenize(doc.page_content)
+        tf = defaultdict(int)
+        for token in tokens:
+            tf[token] += 1
+        for term, count in tf.items():
+            self.postings[term][chunk_id] = count
+
+        self.docs[chunk_id] = (doc.page_content, dict(doc.metadata))
+        self.doc_lens[chunk_id] = len(tokens)
+        self.total_len += len(tokens)
+
+    def remove(self, chunk_id):
+        text, _ = self.docs.pop(chunk_id)
+        for term in set(tokenize(text)):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_len -= self.doc_lens.pop(chunk_id)
+
+    def top_k(self, query_terms, idf, avg_len, k1, b, k):
+        scores = defaultdict(float)
+        for term in query_terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            for chunk_id, tf in postings.items():
+                norm = k1 * (1 - b + b * self.doc_lens[chunk_id] / avg_len)
+                scores[chunk_id] += idf[term] * tf * (k1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+class BM25Index:
+    '''
+    Inverted BM25 index that lives for the whole process, sharded per file.
+    Term statistics are kept globally so scores from different shards can be
+    merged directly, while a filtered query only walks the selected shards.
+    '''
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.shards = {}                    # filename -> BM25Shard
+        self.doc_freq = defaultdict(int)    # term -> number of chunks containing it
+        self.n_docs = 0
+        self.total_len = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self.n_docs
+
+    def add(self, ids, documents):
+        '''
+        Index new chunks into their file's shard. Re-adding an existing id replaces it.
+        Returns the filenames whose shards changed.
+        '''
+        touched = set()
+        with self._lock:
+            for chunk_id, doc in zip(ids, documents):
+                filename = doc.metadata.get("filename")
+                shard = self.shards.get(filename)
+                if shard is None:
+                    shard = self.shards[filename] = BM25Shard(filename)
+                elif chunk_id in shard.docs:
+                    self._remove_chunk(shard, chunk_id)
+
+                shard.add(chunk_id, doc)
+                self._count_chunk(shard, chunk_id, +1)
+                touched.add(filename)
+        return touched
+
+    def update_metadata(self, ids, metadatas):
+        '''
+        Replace stored chunks' metadata; their text and postings stay as they are.
+        Returns the filenames whose shards changed.
+        '''
+        touched = set()
+        with self._lock:
+            for chunk_id, metadata in zip(ids, metadatas):
+                shard = self.shards.get(metadata.get("filename"))
+                if shard is not None and chunk_id in shard.docs:
+                    shard.docs[chunk_id] = (shard.docs[chunk_id][0], dict(metadata))
+                    touched.add(shard.filename)
+        return touched
+
+    def remove(self, filename, ids):
+        '''
+        Drop specific chunks from a file's shard
+        '''
+        with self._lock:
+            shard = self.shards.get(filename)
+            if shard is None:
+                return
+            for chunk_id in ids:
+                if chunk_id in shard.docs:
+                    self._remove_chunk(shard, chunk_id)
+            if not shard.docs:
+                del self.shards[filename]
+
+    def remove_file(self, filename):
+        '''
+        Drop the whole shard for the given file
+        '''
+        with self._lock:
+            shard = self.shards.pop(filename, None)
+            if shard is None:
+                return
+            for chunk_id in list(shard.docs):
+                self._count_chunk(shard, chunk_id, -1)
+
+    def _remove_chunk(self, shard, chunk_id):
+        self._count_chunk(shard, chunk_id, -1)
+        shard.remove(chunk_id)
+
+    def _count_chunk(self, shard, chunk_id, sign):
+        text, _ = shard.docs[chunk_id]
+        for term in set(tokenize(text)):
+            self.doc_freq[term] += sign
+            if self.doc_freq[term] <= 0:
+                del self.doc_freq[term]
+        self.n_docs += sign
+        self.total_len += sign * shard.doc_lens[chunk_id]
+
+    def has_files(self, file_filters=None):
+        if not file_filters:
+            return bool(self.shards)
+        return any(f in self.shards for f in file_filters)
+
+    def search(self, query, k=10, file_filters=None):
+        '''
+        Return the top-k chunks for the query as Documents, best first.
+        Only the shards of the selected files are scored, then their
+        top-k lists are merged.
+        '''
+        with self._lock:
+            if not self.n_docs:
+                return []
+
+            if file_filters:
+                shards = [self.shards[f] for f in file_filters if f in self.shards]
+            else:
+                shards = list(self.shards.values())
+
+            query_terms = [t for t in set(tokenize(query)) if t in self.doc_freq]
+            idf = {
+                t: math.log(1 + (self.n_docs - self.doc_freq[t] + 0.5) / (self.doc_freq[t] + 0.5))
+                for t in query_terms
+            }
+            avg_len = self.total_len / self.n_docs
+
+            candidates = []
+            for shard in shards:
+                for chunk_id, score in shard.top_k(query_terms, idf, avg_len, self.k1, self.b, k):
+                    candidates.append((score, chunk_id, shard))
+
+            top = heapq.nlargest(k, candidates, key=lambda item: item[0])
+            return [self._to_document(shard, chunk_id) for _, chunk_id, shard in top]
+
+    def contains(self, filename, chunk_id):
+        with self._lock:
+            shard = self.shards.get(filename)
+            return shard is not None and chunk_id in shard.docs
+
+    def get_document(self, filename, chunk_id):
+        '''
+        Look up a stored chunk without touching the vector store
+        '''
+        with self._lock:
+            shard = self.shards.get(filename)
+            if shard is None or chunk_id not in shard.docs:
+                return None
+            return self._to_document(shard, chunk_id)
+
+    def _to_document(self, shard, chunk_id):
+        text, metadata = shard.docs[chunk_id]
+        return Document(page_content=text, metadata=dict(metadata), id=chunk_id)
+
+    def save(self, filenames=None, index_dir=None):
+        '''
+        Persist the given shards (all of them by default).
+        Each shard is its own file, written atomically, and removed files
+        have their shard file deleted.
+        '''
+        index_dir = index_dir or settings.BM25_INDEX_DIR
+        os.makedirs(index_dir, exist_ok=True)
+        with self._lock:
+            for filename in (self.shards if filenames is None else filenames):
+                path = os.path.join(index_dir, shard_file_name(filename))
+                shard = self.shards.get(filename)
+                if shard is None:
+                    if os.path.exists(path):
+                        os.remove(path)
+                    continue
+
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    pickle.dump(shard, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, index_dir=None):
+        index_dir = index_dir or settings.BM25_INDEX_DIR
+        index = cls()
+        for name in os.listdir(index_dir):
+            if not name.endswith(".pkl"):
+                continue
+            with open(os.path.join(index_dir, name), "rb") as f:
+                shard = pickle.load(f)
+
+            index.shards[shard.filename] = shard
+            for term, postings in shard.postings.items():
+                index.doc_freq[term] += len(postings)
+            index.n_docs += len(shard)
+            index.total_len += shard.total_len
+        return index
+
+def shard_file_name(filename):
+    '''
+    Filesystem-safe, collision-free name for a file's shard
+    '''
+    return hashlib.sha1(str(filename).encode("utf-8")).hexdigest() + ".pkl"
+
+def build_from_vector_store():
+    '''
+    One-off migration: index whatever is already stored in Chroma
+    '''
+    from src.ingestion.vector_db import get_vector_store
+
+    index = BM25Index()
+    data = get_vector_store().get()
+    if data and data.get("ids"):
+        docs = [
+            Document(page_content=t, metadata=m or {})
+            for t, m in zip(data["documents"], data["metadatas"])
+        ]
+        index.add(data["ids"], docs)
+    return index
+
+@lru_cache(maxsize=1)
+def get_bm25_index():
+    """
+    Returns the process-wide BM25 index.
+    Loaded from disk once, or rebuilt from the vector store if no snapshot exists.
+    """
+    index_dir = settings.BM25_INDEX_DIR
+    if os.path.isdir(index_dir):
+        try:
+            return BM25Index.load(index_dir)
+        except Exception as e:
+            print(f"Failed to load BM25 index from {index_dir}: {e}")
+
+    print("Building BM25 index from the vector store...")
+    index = build_from_vector_store()
+    index.save(index_dir=index_dir)
+    return index
@@ -0,0 +1,38 @@
+import os
+import threading
+from config.settings import settings
+
+_lock = threading.Lock()
+_version = None
+
+def _version_path():
+    return os.path.join(settings.DATA_DIR, "corpus_version")
+
+def _load_version():
+    global _version
+    if _version is None:
+        try:
+            with open(_version_path()) as f:
+                _version = int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            _version = 0
+    return _version
+
+def get_corpus_version():
+    '''
+    Monotonic counter that changes whenever the document collection changes.
+    Caches key on it so their entries never outlive the data they were built from.
+    '''
+    with _lock:
+        return _load_version()
+
+def bump_corpus_version():
+    global _version
+    with _lock:
+        _version = _load_version() + 1
+        os.makedirs(settings.DATA_DIR, exist_ok=True)
+        tmp_path = f"{_version_path()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(_version))
+        os.replace(tmp_path, _version_path())
+        return _version
@@ -0,0 +1,73 @@
+import os
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from src import metrics
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class CachedEmbeddings(Embeddings):
+    '''
+    Wraps an embedding engine with an on-disk cache keyed by (model name, text hash),
+    so text that was embedded before is never sent through the model again
+    '''
+    def __init__(self, engine, model_name, path):
+        self.engine = engine
+        self.model_name = model_name
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, hash))"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        hashes = [content_hash(t) for t in texts]
+        vectors = self._lookup(set(hashes))
+
+        missing = {}
+        for text, h in zip(texts, hashes):
+            if h not in vectors and h not in missing:
+                missing[h] = text
+
+        if missing:
+            computed = self.engine.embed_documents(list(missing.values()))
+            new_vectors = dict(zip(missing.keys(), computed))
+            self._store(new_vectors)
+            vectors.update(new_vectors)
+
+        metrics.increment("embedding_cache.hits", len(texts) - len(missing))
+        metrics.increment("embedding_cache.misses", len(missing))
+        return [list(vectors[h]) for h in hashes]
+
+    def embed_query(self, text):
+        return self.engine.embed_query(text)
+
+    def _lookup(self, hashes):
+        found = {}
+        hashes = list(hashes)
+        with self._lock:
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(batch))})",
+                    [self.model_name, *batch],
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def _store(self, vectors):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)",
+                [(self.model_name, h, np.asarray(v, dtype=np.float32).tobytes()) for h, v in vectors.items()],
+            )
+            self._conn.commit()
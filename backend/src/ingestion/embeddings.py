@@ -0,0 +1,146 @@
+import os
+import time
+import queue
+import threading
+import numpy as np
+from concurrent.futures import Future
+from langchain_core.embeddings import Embeddings
+from sentence_transformers import SentenceTransformer
+from config.settings import settings
+from src import metrics
+
+# Domain sentences used to compare quantized outputs against fp32
+PARITY_SAMPLES = [
+    "What is the time complexity of inserting into a B-tree?",
+    "The derivative of sin(x) is cos(x).",
+    "Dijkstra's algorithm finds shortest paths in graphs with non-negative edge weights.",
+    "A Transformer uses multi-head self-attention instead of recurrence.",
+    "Eigenvalues of a symmetric matrix are always real.",
+    "def quicksort(arr): return arr if len(arr) <= 1 else ...",
+]
+
+def detect_device():
+    '''
+    Pick the embedding device: an explicit EMBEDDING_DEVICE wins, otherwise
+    CUDA, then Apple MPS, then CPU
+    '''
+    if settings.EMBEDDING_DEVICE != "auto":
+        return settings.EMBEDDING_DEVICE
+
+    import torch
+    if torch.cuda.is_available():
+        return "cuda"
+    if getattr(torch.backends, "mps", None) and torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+class QueryBatcher:
+    '''
+    Collects single-query embedding requests from concurrent threads for a
+    short window and encodes them in one forward pass
+    '''
+    def __init__(self, encode_fn, window_ms=5, max_batch=32):
+        self.encode_fn = encode_fn
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, name="embedding-batcher", daemon=True).start()
+
+    def submit(self, text):
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                with metrics.timer("embedding.query_batch"):
+                    vectors = self.encode_fn([text for text, _ in batch])
+                metrics.increment("embedding.query_batches")
+                metrics.increment("embedding.queries", len(batch))
+                for (_, future), vector in zip(batch, vectors):
+                    future.set_result(vector)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+class EmbeddingEngine(Embeddings):
+    '''
+    Sentence-transformers embeddings with normalized outputs and micro-batched queries
+    '''
+    def __init__(self, model, batch_size=32, window_ms=5, max_batch=32):
+        self.model = model
+        self.batch_size = batch_size
+        self._batcher = QueryBatcher(self._encode, window_ms=window_ms, max_batch=max_batch)
+
+    def _encode(self, texts):
+        vectors = self.model.encode(
+            texts, batch_size=self.batch_size, normalize_embeddings=True, convert_to_numpy=True
+        )
+        return vectors.tolist()
+
+    def embed_documents(self, texts):
+        return self._encode(list(texts))
+
+    def embed_query(self, text):
+        return self._batcher.submit(text)
+
+def load_quantized_model(model_name, reference):
+    '''
+    Load (exporting on first use) a dynamic int8 ONNX build of the model and
+    check it against the fp32 reference. Returns None if parity fails.
+    '''
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    config = settings.EMBEDDING_ONNX_QUANTIZATION
+    file_name = f"onnx/model_qint8_{config}.onnx"
+    local_dir = os.path.join(settings.DATA_DIR, "onnx", model_name.replace("/", "__"))
+
+    if not os.path.exists(os.path.join(local_dir, file_name)):
+        print(f"Exporting int8 ONNX embedding model ({config}) to {local_dir}...")
+        onnx_model = SentenceTransformer(model_name, backend="onnx", device="cpu")
+        onnx_model.save_pretrained(local_dir)
+        export_dynamic_quantized_onnx_model(onnx_model, config, local_dir)
+
+    quantized = SentenceTransformer(
+        local_dir, backend="onnx", device="cpu", model_kwargs={"file_name": file_name}
+    )
+
+    expected = reference.encode(PARITY_SAMPLES, normalize_embeddings=True)
+    actual = quantized.encode(PARITY_SAMPLES, normalize_embeddings=True)
+    min_cosine = float(np.min(np.sum(expected * actual, axis=1)))
+    print(f"Int8 embedding parity: min cosine {min_cosine:.4f}")
+    if min_cosine < settings.EMBEDDING_PARITY_THRESHOLD:
+        print(f"Int8 embeddings below parity threshold {settings.EMBEDDING_PARITY_THRESHOLD}, using fp32.")
+        return None
+    return quantized
+
+def build_embedding_engine():
+    device = detect_device()
+    model_name = settings.EMBEDDING_MODEL_NAME
+    model = SentenceTransformer(model_name, device=device)
+
+    if settings.EMBEDDING_BACKEND == "onnx-int8":
+        try:
+            model = load_quantized_model(model_name, model) or model
+        except Exception as e:
+            print(f"Int8 ONNX embedding backend unavailable, using fp32: {e}")
+
+    print(f"Embedding model '{model_name}' on {device} ({settings.EMBEDDING_BACKEND}).")
+    return EmbeddingEngine(
+        model,
+        batch_size=settings.EMBEDDING_BATCH_SIZE,
+        window_ms=settings.EMBEDDING_BATCH_WINDOW_MS,
+        max_batch=settings.EMBEDDING_MAX_BATCH,
+    )
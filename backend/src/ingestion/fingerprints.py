@@ -0,0 +1,84 @@
+import os
+import sqlite3
+import threading
+from difflib import SequenceMatcher
+from functools import lru_cache
+from config.settings import settings
+
+class FingerprintStore:
+    '''
+    Per-page content fingerprints and whole-file content hashes of every
+    ingested file, used to find which pages changed (or that nothing did)
+    when a file is uploaded again
+    '''
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS page_fingerprints ("
+            "filename TEXT NOT NULL, page_number INTEGER NOT NULL, fingerprint TEXT NOT NULL, "
+            "PRIMARY KEY (filename, page_number))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_hashes (filename TEXT PRIMARY KEY, content_hash TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get(self, filename):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT page_number, fingerprint FROM page_fingerprints WHERE filename = ?", (filename,)
+            ).fetchall()
+        return dict(rows)
+
+    def replace(self, filename, fingerprints):
+        with self._lock:
+            self._conn.execute("DELETE FROM page_fingerprints WHERE filename = ?", (filename,))
+            self._conn.executemany(
+                "INSERT INTO page_fingerprints (filename, page_number, fingerprint) VALUES (?, ?, ?)",
+                [(filename, page, fp) for page, fp in fingerprints.items()],
+            )
+            self._conn.commit()
+
+    def get_content_hash(self, filename):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash FROM file_hashes WHERE filename = ?", (filename,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_content_hash(self, filename, content_hash):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_hashes (filename, content_hash) VALUES (?, ?)",
+                (filename, content_hash),
+            )
+            self._conn.commit()
+
+    def delete(self, filenames):
+        params = [(filename,) for filename in filenames]
+        with self._lock:
+            self._conn.executemany("DELETE FROM page_fingerprints WHERE filename = ?", params)
+            self._conn.executemany("DELETE FROM file_hashes WHERE filename = ?", params)
+            self._conn.commit()
+
+def match_pages(previous, current):
+    '''
+    Pair old and new pages that have the same fingerprint, keeping page order,
+    so inserting or removing a page leaves the pages after it matched.
+    Returns {old page number: new page number} for the matched pages.
+    '''
+    old_pages, new_pages = sorted(previous), sorted(current)
+    matcher = SequenceMatcher(
+        None, [previous[p] for p in old_pages], [current[p] for p in new_pages], autojunk=False
+    )
+    page_map = {}
+    for old_start, new_start, size in matcher.get_matching_blocks():
+        for i in range(size):
+            page_map[old_pages[old_start + i]] = new_pages[new_start + i]
+    return page_map
+
+@lru_cache(maxsize=1)
+def get_fingerprint_store():
+    return FingerprintStore(os.path.join(settings.DATA_DIR, "ingestion.sqlite3"))
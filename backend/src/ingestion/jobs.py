@@ -0,0 +1,239 @@
+import os
+import time
+import uuid
+import shutil
+import asyncio
+import weakref
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import AsyncExitStack
+from functools import lru_cache
+from config.settings import settings
+from src.ingestion.pipeline import plan_ingest, commit_ingest, commit_ingest_batch
+from src.ingestion.workers import init_worker, convert_file, convert_pages
+from src.ingestion.splitter import split_documents
+from src import metrics
+
+class QueueFullError(Exception):
+    pass
+
+class IngestionJobManager:
+    '''
+    Runs uploads in the background. Docling conversion happens in a pool of
+    worker processes (each with its own cached converter), while planning and
+    indexing run in threads of the API process, which owns the stores.
+    The number of files waiting or in flight is bounded.
+    '''
+    def __init__(self, workers, max_pending, max_jobs=500):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_jobs = max_jobs
+        self._pool = None
+        self._jobs = OrderedDict()      # job id -> job dict, oldest first
+        self._tasks = set()
+        # Only alive while a job holds or waits for them, so the dict doesn't grow with every filename
+        self._file_locks = weakref.WeakValueDictionary()
+        self._pending = 0
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+            )
+        return self._pool
+
+    def _file_lock(self, filename):
+        lock = self._file_locks.get(filename)
+        if lock is None:
+            lock = self._file_locks[filename] = asyncio.Lock()
+        return lock
+
+    def check_capacity(self, n_files):
+        if self._pending + n_files > self.max_pending:
+            raise QueueFullError(
+                f"Ingestion queue is full ({self._pending}/{self.max_pending} files pending). Try again later."
+            )
+
+    def submit(self, files, workdir=None, incremental=False):
+        '''
+        Queue a job for a list of (temp_path, filename, content_hash) tuples and return it immediately
+        '''
+        self.check_capacity(len(files))
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "created_at": time.time(),
+            "finished_at": None,
+            "files": [
+                {"filename": filename, "stage": "queued", "error": None, "summary": None}
+                for _, filename, _ in files
+            ],
+        }
+        self._jobs[job["id"]] = job
+        self._trim_jobs()
+        self._pending += len(files)
+        metrics.increment("ingestion.jobs")
+
+        task = asyncio.create_task(self._run(job, files, workdir, incremental))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def _trim_jobs(self):
+        finished = [jid for jid, job in self._jobs.items() if job["finished_at"] is not None]
+        while len(self._jobs) > self.max_jobs and finished:
+            del self._jobs[finished.pop(0)]
+
+    async def _run(self, job, files, workdir, incremental):
+        '''
+        Plan and convert the job's files concurrently, then commit them as one
+        batch: one vector store write, one BM25 save and one corpus version bump
+        '''
+        job["status"] = "running"
+        start = time.perf_counter()
+        try:
+            # A later copy of the same filename in this batch wins
+            latest = {entry["filename"]: i for i, entry in enumerate(job["files"])}
+            for i, entry in enumerate(job["files"]):
+                if latest[entry["filename"]] != i:
+                    entry["stage"] = "failed"
+                    entry["error"] = "Superseded by a later copy in the same batch."
+
+            # One ingestion at a time per filename so fingerprints and chunk ids stay
+            # consistent; locks are taken in name order so overlapping jobs can't deadlock
+            async with AsyncExitStack() as stack:
+                for filename in sorted(latest):
+                    await stack.enter_async_context(self._file_lock(filename))
+                started = {}    # filename -> when its planning began
+                prepared = await asyncio.gather(*[
+                    self._prepare_file(entry, path, incremental, content_hash, started)
+                    for entry, (path, _, content_hash) in zip(job["files"], files)
+                    if entry["stage"] != "failed"
+                ])
+                await self._commit([item for item in prepared if item is not None])
+            committed = time.perf_counter()
+            for entry in job["files"]:
+                if entry["stage"] == "done":
+                    metrics.observe("ingestion.file", committed - started[entry["filename"]])
+            metrics.observe("ingestion.job", committed - start)
+        finally:
+            self._pending -= len(files)
+            for path, _, _ in files:
+                if os.path.exists(path): os.remove(path)
+            failed = sum(1 for entry in job["files"] if entry["stage"] == "failed")
+            job["status"] = "failed" if failed == len(job["files"]) else "done"
+            job["finished_at"] = time.time()
+            if workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    async def _prepare_file(self, entry, path, incremental, content_hash=None, started=None):
+        '''
+        Plan and convert one file. Returns (entry, chunks, plan), or None if it failed.
+        '''
+        filename = entry["filename"]
+        if started is not None:
+            started[filename] = time.perf_counter()
+        try:
+            entry["stage"] = "planning"
+            plan = await asyncio.to_thread(plan_ingest, path, filename, incremental, content_hash)
+
+            chunks = []
+            if plan.needs_conversion:
+                entry["stage"] = "converting"
+                chunks = await self._convert(path, filename, plan)
+            entry["stage"] = "converted"
+            return entry, chunks, plan
+        except Exception as e:
+            self._fail(entry, e)
+            return None
+
+    async def _commit(self, prepared):
+        if not prepared:
+            return
+        for entry, _, _ in prepared:
+            entry["stage"] = "indexing"
+        try:
+            summaries = await asyncio.to_thread(
+                commit_ingest_batch, [(entry["filename"], chunks, plan) for entry, chunks, plan in prepared]
+            )
+        except Exception as e:
+            if len(prepared) == 1:
+                self._fail(prepared[0][0], e)
+                return
+            # Don't let one bad file sink the batch: retry the files one by one
+            print(f"Batch commit of {len(prepared)} files failed ({e}), committing them one at a time")
+            summaries = {}
+            for entry, chunks, plan in prepared:
+                try:
+                    summaries[entry["filename"]] = await asyncio.to_thread(commit_ingest, entry["filename"], chunks, plan)
+                except Exception as file_error:
+                    self._fail(entry, file_error)
+
+        for entry, _, _ in prepared:
+            if entry["stage"] == "failed":
+                continue
+            summary = summaries.get(entry["filename"])
+            if summary is None:
+                self._fail(entry, ValueError("No content could be extracted."))
+                continue
+            entry["summary"] = summary
+            entry["stage"] = "done"
+
+    def _fail(self, entry, error):
+        print(f"Ingestion of '{entry['filename']}' failed: {error}")
+        entry["stage"] = "failed"
+        entry["error"] = str(error)
+        metrics.increment("ingestion.failures")
+
+    def page_batches(self, plan):
+        '''
+        Page groups to convert in parallel, or None if the file should be converted in one task
+        '''
+        if self.workers < 2 or not plan.fingerprints:
+            return None
+        pages = sorted(plan.pages_to_convert if plan.pages_to_convert is not None else plan.fingerprints)
+        if len(pages) < settings.PARALLEL_CONVERSION_MIN_PAGES:
+            return None
+        size = settings.PARALLEL_CONVERSION_PAGES_PER_TASK
+        return [set(pages[i:i + size]) for i in range(0, len(pages), size)]
+
+    async def _convert(self, path, filename, plan):
+        loop = asyncio.get_running_loop()
+        batches = self.page_batches(plan)
+        if batches is None:
+            return await loop.run_in_executor(
+                self._get_pool(), convert_file, path, filename, plan.pages_to_convert
+            )
+
+        # Large PDF: convert page ranges across the pool, then merge back in page order
+        print(f"Converting '{filename}' in {len(batches)} page ranges across {self.workers} workers")
+        results = await asyncio.gather(*[
+            loop.run_in_executor(self._get_pool(), convert_pages, path, pages)
+            for pages in batches
+        ])
+        for pages, docs in zip(batches, results):
+            if not docs:
+                raise ValueError(f"Conversion failed for pages {min(pages)}-{max(pages)}.")
+        raw_docs = sorted((doc for docs in results for doc in docs), key=lambda d: d.metadata["page_number"])
+        for doc in raw_docs: doc.metadata["filename"] = filename
+        metrics.increment("ingestion.parallel_ranges", len(batches))
+        return await asyncio.to_thread(split_documents, raw_docs)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+@lru_cache(maxsize=1)
+def get_job_manager():
+    return IngestionJobManager(
+        workers=settings.INGEST_WORKERS,
+        max_pending=settings.INGEST_QUEUE_DEPTH,
+    )
@@ -1,10 +1,15 @@
 import os
+import hashlib
 import torch
+import pypdfium2 as pdfium
 from functools import lru_cache
 from docling.document_converter import DocumentConverter, PdfFormatOption
 from docling.datamodel.base_models import InputFormat
 from docling.datamodel.pipeline_options import PdfPipelineOptions, AcceleratorOptions, AcceleratorDevice
+from docling_core.transforms.serializer.markdown import MarkdownDocSerializer, MarkdownParams
 from langchain_core.documents import Document
+from config.settings import settings
+from src.ingestion.text_layer import page_lines, classify_page, lines_to_markdown
 
 @lru_cache(maxsize=1)
 def get_docling_converter():
@@ -23,21 +28,136 @@ def get_docling_converter():
     )
     return converter
 
-def load_file_with_docling(file_path):
+def compute_page_fingerprints(file_path):
     '''
-    Load file into the converter and export as Markdown format
+    Cheap per-page fingerprints read from the PDF text layer, without running docling.
+    Returns {page_number: fingerprint}, or None for non-PDF files.
+    '''
+    if not file_path.lower().endswith(".pdf"):
+        return None
+
+    fingerprints = {}
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        for page_num in range(1, len(pdf) + 1):
+            page = pdf[page_num - 1]
+            width, height = page.get_size()
+            text = page.get_textpage().get_text_range()
+            n_objects = sum(1 for _ in page.get_objects())
+
+            digest = hashlib.sha256(f"{width:.1f}x{height:.1f}|{n_objects}|".encode("utf-8"))
+            digest.update(text.encode("utf-8"))
+            fingerprints[page_num] = digest.hexdigest()
+    finally:
+        pdf.close()
+    return fingerprints
+
+def page_ranges(pages):
+    '''
+    Collapse page numbers into contiguous (start, end) ranges, 1-based and inclusive
+    '''
+    ranges = []
+    for page in sorted(pages):
+        if ranges and page == ranges[-1][1] + 1:
+            ranges[-1][1] = page
+        else:
+            ranges.append([page, page])
+    return [tuple(r) for r in ranges]
+
+def item_pages(document, item):
+    '''
+    Pages an item and its children start on, by first provenance
+    '''
+    pages = set()
+    for node, _ in document.iterate_items(root=item, with_groups=True):
+        prov = getattr(node, "prov", None)
+        if prov:
+            pages.add(prov[0].page_no)
+    return pages
+
+def export_markdown_by_page(document):
+    '''
+    Export the document to Markdown in one walk over its top-level items, partitioned by page.
+    Only items spanning several pages (e.g. lists) are re-serialized per page.
+    Returns {page_number: markdown}; pages without content map to "".
+    '''
+    serializer = MarkdownDocSerializer(doc=document, params=MarkdownParams())
+    parts = {page_num: [] for page_num in document.pages}
+    visited = set()
+    for ref in document.body.children:
+        item = ref.resolve(document)
+        pages = sorted(item_pages(document, item))
+        if len(pages) == 1:
+            text = serializer.serialize(item=item, visited=visited).text
+            if text: parts.setdefault(pages[0], []).append(text)
+            continue
+
+        for page_num in pages:
+            text = serializer.serialize(item=item, visited=set(visited), pages={page_num}).text
+            if text: parts.setdefault(page_num, []).append(text)
+        visited.update(node.self_ref for node, _ in document.iterate_items(root=item, with_groups=True))
+
+    return {page_num: "\n\n".join(texts) for page_num, texts in parts.items()}
+
+def extract_text_layer_pages(file_path, pages=None):
+    '''
+    Take plain text pages straight from the PDF text layer.
+    Returns ({page_number: markdown}, set of pages that still need docling).
+    '''
+    texts, docling_pages = {}, set()
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        for page_num in sorted(pages) if pages else range(1, len(pdf) + 1):
+            page = pdf[page_num - 1]
+            try:
+                textpage = page.get_textpage()
+                lines = page_lines(textpage)
+                if classify_page(page, textpage, lines) == "text":
+                    texts[page_num] = lines_to_markdown(lines)
+                    continue
+            except Exception as e:
+                # One odd page goes to docling, the rest of the file keeps the fast path
+                print(f"Text layer extraction failed on page {page_num}, using docling for it: {e}")
+            docling_pages.add(page_num)
+    finally:
+        pdf.close()
+    return texts, docling_pages
+
+def load_file_with_docling(file_path, pages=None):
+    '''
+    Load file into the converter and export as Markdown format.
+    If pages is given, only those pages are converted. Plain text PDF pages
+    are read from the text layer; docling only sees the pages that need it.
     '''
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File {file_path} not found.")
 
     try:
-        converter = get_docling_converter()
-        result = converter.convert(file_path)
+        texts, docling_pages = {}, pages
+        if settings.TEXT_LAYER_FAST_PATH and file_path.lower().endswith(".pdf"):
+            try:
+                texts, docling_pages = extract_text_layer_pages(file_path, pages)
+                print(f"{os.path.basename(file_path)}: {len(texts)} page(s) from the text layer, {len(docling_pages)} via docling")
+            except Exception as e:
+                print(f"Text layer extraction failed, using docling for every page: {e}")
+                texts, docling_pages = {}, pages
+
+        # None means the whole file; an empty set means the text layer covered everything
+        if docling_pages is None or docling_pages:
+            converter = get_docling_converter()
+            if docling_pages:
+                results = [converter.convert(file_path, page_range=r) for r in page_ranges(docling_pages)]
+            else:
+                results = [converter.convert(file_path)]
+
+            for result in results:
+                for page_num, text in export_markdown_by_page(result.document).items():
+                    if docling_pages and page_num not in docling_pages:
+                        continue
+                    texts[page_num] = text
         
         output_docs = []
-        for page_num, _ in result.document.pages.items():
-            text = result.document.export_to_markdown(page_no=page_num)
-            
+        for page_num, text in sorted(texts.items()):
             output_docs.append(Document(
                 page_content=text,
                 metadata={
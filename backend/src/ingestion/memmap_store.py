@@ -0,0 +1,313 @@
+import os
+import json
+import uuid
+import sqlite3
+import threading
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+OPERATORS = {
+    "$eq": lambda value, arg: value == arg,
+    "$ne": lambda value, arg: value != arg,
+    "$in": lambda value, arg: value in arg,
+    "$nin": lambda value, arg: value not in arg,
+    "$gt": lambda value, arg: value is not None and value > arg,
+    "$gte": lambda value, arg: value is not None and value >= arg,
+    "$lt": lambda value, arg: value is not None and value < arg,
+    "$lte": lambda value, arg: value is not None and value <= arg,
+}
+
+def matches(metadata, where):
+    '''
+    Evaluate a Chroma-style where filter ($and, $or, $eq, $in, $lte, ...) against one metadata dict
+    '''
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(metadata, clause) for clause in condition):
+                return False
+        else:
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            value = metadata.get(key)
+            if not all(OPERATORS[op](value, arg) for op, arg in condition.items()):
+                return False
+    return True
+
+def filename_values(where):
+    '''
+    The filenames a {"filename": x} or {"filename": {"$in": [...]}} filter allows, else None
+    '''
+    if not where or list(where) != ["filename"]:
+        return None
+    condition = where["filename"]
+    if not isinstance(condition, dict):
+        return [condition]
+    if list(condition) == ["$eq"]:
+        return [condition["$eq"]]
+    if list(condition) == ["$in"]:
+        return list(condition["$in"])
+    return None
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+class MemmapVectorStore(VectorStore):
+    '''
+    In-process vector store. Normalized embeddings live in a memory-mapped
+    matrix with one row per chunk; ids, texts and metadata live in a SQLite
+    sidecar, with the metadata also held in memory for filtering. A search is
+    an exact top-k over the rows that pass the filter, as one matrix-vector
+    product. Deleted rows are reused by later adds.
+    Mirrors the parts of the Chroma wrapper this app uses: get(where, include),
+    delete(ids / where), add_documents(ids) and filtered similarity search,
+    plus update_metadatas in place of Chroma's collection.update.
+    '''
+    def __init__(self, path, embedding_function, dtype="float32"):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._embedding = embedding_function
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(path, "chunks.sqlite3"), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, document TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+        info = dict(self._conn.execute("SELECT key, value FROM info").fetchall())
+        self.dtype = np.dtype(info.get("dtype", dtype))
+        self.dim = int(info["dim"]) if "dim" in info else None
+        self._matrix = None
+
+        # Per row: id and metadata (None for free rows), and a file code for fast filename filters
+        self._ids, self._metadatas = [], []
+        self._file_codes = np.zeros(0, dtype=np.int32)
+        self._codes = {}
+        self._rows = {}
+        self._free = []
+        self._load()
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _matrix_path(self):
+        return os.path.join(self.path, "vectors.bin")
+
+    def _load(self):
+        rows = self._conn.execute("SELECT row, id, metadata FROM chunks ORDER BY row").fetchall()
+        size = rows[-1][0] + 1 if rows else 0
+        self._ids, self._metadatas = [None] * size, [None] * size
+        self._file_codes = np.full(max(size, 1), -1, dtype=np.int32)
+        for row, chunk_id, metadata in rows:
+            self._set_row(row, chunk_id, json.loads(metadata))
+        self._free = [row for row in range(size) if self._ids[row] is None]
+        if self.dim is not None:
+            self._open_matrix(max(size, 1))
+
+    def _open_matrix(self, min_rows):
+        '''
+        Map the matrix file, growing it (by doubling) to hold at least min_rows rows
+        '''
+        row_bytes = self.dim * self.dtype.itemsize
+        path = self._matrix_path()
+        capacity = os.path.getsize(path) // row_bytes if os.path.exists(path) else 0
+        if capacity < min_rows:
+            capacity = max(min_rows, 2 * capacity, 1024)
+            self._matrix = None
+            with open(path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        if self._matrix is None or len(self._matrix) != capacity:
+            self._matrix = np.memmap(path, dtype=self.dtype, mode="r+", shape=(capacity, self.dim))
+
+    def _file_code(self, filename):
+        return self._codes.setdefault(filename, len(self._codes))
+
+    def _set_row(self, row, chunk_id, metadata):
+        if row >= len(self._ids):
+            grow = row + 1 - len(self._ids)
+            self._ids += [None] * grow
+            self._metadatas += [None] * grow
+        if row >= len(self._file_codes):
+            self._file_codes = np.concatenate([
+                self._file_codes, np.full(max(row + 1, 2 * len(self._file_codes)) - len(self._file_codes), -1, dtype=np.int32)
+            ])
+        self._ids[row] = chunk_id
+        self._metadatas[row] = metadata
+        self._file_codes[row] = self._file_code(metadata.get("filename"))
+        self._rows[chunk_id] = row
+
+    def _select(self, ids=None, where=None):
+        '''
+        Rows matching ids and/or a where filter, as a sorted int array
+        '''
+        size = len(self._ids)
+        if ids is not None:
+            rows = np.array(sorted(self._rows[i] for i in ids if i in self._rows), dtype=np.int64)
+        else:
+            rows = np.flatnonzero(self._file_codes[:size] >= 0)
+        if not where or not rows.size:
+            return rows
+
+        filenames = filename_values(where)
+        if filenames is not None:
+            codes = [self._codes[f] for f in filenames if f in self._codes]
+            return rows[np.isin(self._file_codes[rows], codes)]
+        return np.array([row for row in rows if matches(self._metadatas[row], where)], dtype=np.int64)
+
+    def _documents(self, rows):
+        if not len(rows):
+            return {}
+        found = {}
+        rows = [int(row) for row in rows]
+        for i in range(0, len(rows), 900):     # SQLite parameter limit
+            batch = rows[i:i + 900]
+            found.update(self._conn.execute(
+                f"SELECT row, document FROM chunks WHERE row IN ({', '.join('?' * len(batch))})", batch
+            ).fetchall())
+        return found
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        ids = list(ids) if ids is not None else [uuid.uuid4().hex for _ in texts]
+        last = {chunk_id: i for i, chunk_id in enumerate(ids)}
+        if len(last) < len(ids):
+            # Repeated ids within one call: the last one wins, as in an upsert
+            keep = sorted(last.values())
+            texts, metadatas, ids = [texts[i] for i in keep], [metadatas[i] for i in keep], [ids[i] for i in keep]
+        vectors = normalize(self._embedding.embed_documents(texts))
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)",
+                    [("dim", str(self.dim)), ("dtype", self.dtype.name)],
+                )
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding size {vectors.shape[1]} does not match the store's {self.dim}.")
+
+            rows = []
+            for chunk_id in ids:
+                if chunk_id in self._rows:
+                    rows.append(self._rows[chunk_id])
+                elif self._free:
+                    rows.append(self._free.pop())
+                else:
+                    rows.append(len(self._ids))
+                    self._ids.append(None)
+                    self._metadatas.append(None)
+            self._open_matrix(len(self._ids))
+            self._matrix[rows] = vectors.astype(self.dtype)
+            self._matrix.flush()
+
+            # The sidecar is written after the vectors, so a crash in between leaves free rows, never dangling ones
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                [(row, chunk_id, text, json.dumps(metadata))
+                 for row, chunk_id, text, metadata in zip(rows, ids, texts, metadatas)],
+            )
+            self._conn.commit()
+            for row, chunk_id, metadata in zip(rows, ids, metadatas):
+                self._set_row(row, chunk_id, dict(metadata))
+        return ids
+
+    def update_metadatas(self, ids, metadatas):
+        '''
+        Replace the metadata of stored chunks, keeping their vectors and text
+        '''
+        with self._lock:
+            updates = [(chunk_id, dict(m)) for chunk_id, m in zip(ids, metadatas) if chunk_id in self._rows]
+            self._conn.executemany(
+                "UPDATE chunks SET metadata = ? WHERE id = ?", [(json.dumps(m), chunk_id) for chunk_id, m in updates]
+            )
+            self._conn.commit()
+            for chunk_id, metadata in updates:
+                self._set_row(self._rows[chunk_id], chunk_id, metadata)
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("metadatas", "documents"), **kwargs):
+        with self._lock:
+            rows = self._select(ids=ids, where=where)[offset or 0:]
+            if limit is not None:
+                rows = rows[:limit]
+            result = {"ids": [self._ids[row] for row in rows], "metadatas": None, "documents": None, "embeddings": None}
+            if "metadatas" in include:
+                result["metadatas"] = [dict(self._metadatas[row]) for row in rows]
+            if "documents" in include:
+                documents = self._documents(rows)
+                result["documents"] = [documents.get(int(row)) for row in rows]
+            if "embeddings" in include and self._matrix is not None:
+                result["embeddings"] = np.asarray(self._matrix[rows], dtype=np.float32)
+        return result
+
+    def delete(self, ids=None, where=None, **kwargs):
+        if ids is None and where is None:
+            return None
+        with self._lock:
+            rows = [int(row) for row in self._select(ids=ids, where=where)]
+            if not rows:
+                return True
+            self._conn.executemany("DELETE FROM chunks WHERE row = ?", [(row,) for row in rows])
+            self._conn.commit()
+            for row in rows:
+                self._rows.pop(self._ids[row], None)
+                self._ids[row] = None
+                self._metadatas[row] = None
+                self._file_codes[row] = -1
+            self._free.extend(rows)
+        return True
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4, filter=None):
+        query = normalize(embedding)
+        with self._lock:
+            rows = self._select(where=filter)
+            if not rows.size or self._matrix is None:
+                return []
+            if rows[-1] - rows[0] + 1 == rows.size:
+                candidates = self._matrix[rows[0]:rows[-1] + 1]     # contiguous: a view, no copy
+            else:
+                candidates = self._matrix[rows]
+            scores = candidates @ query if self.dtype == np.float32 else candidates.astype(np.float32) @ query
+            k = min(k, rows.size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            documents = self._documents(rows[top])
+            return [
+                (Document(page_content=documents.get(int(rows[i]), ""), metadata=dict(self._metadatas[rows[i]]),
+                          id=self._ids[rows[i]]), float(scores[i]))
+                for i in top
+            ]
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        '''
+        Scores are cosine similarities (higher is closer)
+        '''
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k=k, filter=filter)
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)]
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: (score + 1) / 2
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, path="vectors", **kwargs):
+        store = cls(path, embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
@@ -0,0 +1,360 @@
+import os
+import time
+import hashlib
+from dataclasses import dataclass
+from typing import Optional
+from config.settings import settings
+from src.ingestion.loader import compute_page_fingerprints, page_ranges
+from src.ingestion.workers import convert_file
+from src.ingestion.vector_db import get_vector_store, update_chunk_metadata
+from src.ingestion.bm25_index import get_bm25_index
+from src.ingestion.embedding_cache import content_hash
+from src.ingestion.corpus import bump_corpus_version
+from src.ingestion.fingerprints import get_fingerprint_store, match_pages
+from src.ingestion.registry import get_file_registry
+
+def chunk_id(filename, text_hash):
+    '''
+    Deterministic Chroma id: the same text in the same file always maps to the same id
+    '''
+    return hashlib.sha256(f"{filename}\x00{text_hash}".encode("utf-8")).hexdigest()
+
+def assign_chunk_ids(filename, chunks):
+    '''
+    Hash every chunk, drop repeated text within the file and return (ids, chunks)
+    '''
+    ids, unique_chunks, seen = [], [], set()
+    for chunk in chunks:
+        text_hash = content_hash(chunk.page_content)
+        cid = chunk_id(filename, text_hash)
+        if cid in seen:
+            continue
+        seen.add(cid)
+        chunk.metadata["content_hash"] = text_hash
+        ids.append(cid)
+        unique_chunks.append(chunk)
+    return ids, unique_chunks
+
+def pages_filter(pages):
+    '''
+    Chroma filter for chunks whose page span touches any of the pages
+    '''
+    clauses = [{"page_number": {"$in": sorted(pages)}}]    # chunks stored before page spans existed
+    for start, end in page_ranges(pages):
+        clauses.append({"$and": [{"page_start": {"$lte": end}}, {"page_end": {"$gte": start}}]})
+    return {"$or": clauses}
+
+def get_file_chunk_ids(filename, pages=None):
+    where = {"filename": filename}
+    if pages is not None:
+        if not pages:
+            return set()
+        where = {"$and": [where, pages_filter(pages)]}
+    data = get_vector_store().get(where=where, include=[])
+    return set(data.get("ids") or [])
+
+def chunk_span(metadata):
+    start = metadata.get("page_start", metadata.get("page_number"))
+    end = metadata.get("page_end", metadata.get("page_number"))
+    return (start, end) if start is not None and end is not None else None
+
+def expand_to_chunk_spans(filename, pages, page_map):
+    '''
+    Grow a set of stored page numbers until it covers every stored chunk that
+    has to be rebuilt: chunks on a page without a match in the new upload, or
+    whose pages are no longer consecutive (a page was inserted in between),
+    and then every chunk sharing a page with one of those
+    '''
+    spans = {chunk_span(m) for m in get_files_chunks([filename])[filename].values()} - {None}
+    pages = set(pages)
+    for start, end in spans:
+        if any(p not in page_map for p in range(start, end + 1)) or page_map[end] - page_map[start] != end - start:
+            pages.update(range(start, end + 1))
+
+    grown = True
+    while grown:
+        grown = False
+        for start, end in spans:
+            span = set(range(start, end + 1))
+            if span & pages and not span <= pages:
+                pages |= span
+                grown = True
+    return pages
+
+def renumber_pages(metadata, page_map):
+    '''
+    Metadata with its page fields moved to the new page numbers
+    '''
+    metadata = dict(metadata)
+    for key in ("page_number", "page_start", "page_end"):
+        if metadata.get(key) in page_map:
+            metadata[key] = page_map[metadata[key]]
+    return metadata
+
+def get_files_chunks(filenames):
+    '''
+    Stored chunks of several files in one query, as {filename: {chunk id: metadata}}
+    '''
+    chunks = {filename: {} for filename in filenames}
+    if not chunks:
+        return chunks
+    where = {"filename": {"$in": list(chunks)}} if len(chunks) > 1 else {"filename": next(iter(chunks))}
+    data = get_vector_store().get(where=where, include=["metadatas"])
+    for chunk_id, m in zip(data.get("ids") or [], data.get("metadatas") or []):
+        if m and m.get("filename") in chunks:
+            chunks[m["filename"]][chunk_id] = m
+    return chunks
+
+def metadata_changed(stored, metadata):
+    return any(stored.get(key) != value for key, value in metadata.items())
+
+def index_files(items, page_maps=None):
+    '''
+    Bring the stores in line with the given chunks of several files at once.
+    items are (filename, chunks, pages) tuples. Chunks already stored keep
+    their embedding, but get the new metadata if it changed (e.g. the page
+    they are on); new ones are embedded and upserted, and stale ones from a
+    previous version of a file are deleted. If pages is given, the chunks only
+    replace what is stored for those (stored) pages of that file, and
+    page_maps[filename] ({old page: new page}) renumbers the chunks kept
+    outside of them.
+    All files share one delete and one add on the vector store, one BM25 save
+    and one corpus version bump. Each store is checked for what it is missing,
+    so chunks that reached the vector store but not BM25 (e.g. in a batch that
+    failed halfway) are still added to BM25. Returns {filename: summary}.
+    '''
+    page_maps = page_maps or {}
+    bm25_index = get_bm25_index()
+    existing = get_files_chunks([filename for filename, _, _ in items])
+    stale, new, keyword_only, refreshed, summaries = [], [], [], [], {}
+    for filename, chunks, pages in items:
+        ids, chunks = assign_chunk_ids(filename, chunks)
+        stored = existing[filename]
+        in_scope = set(stored) if pages is None else get_file_chunk_ids(filename, pages)
+        file_stale = in_scope - set(ids)
+        file_new = [(cid, chunk) for cid, chunk in zip(ids, chunks) if cid not in stored]
+        file_keyword_only = [
+            (cid, chunk) for cid, chunk in zip(ids, chunks)
+            if cid in stored and not bm25_index.contains(filename, cid)
+        ]
+        file_refreshed = [
+            (cid, dict(chunk.metadata)) for cid, chunk in zip(ids, chunks)
+            if cid in stored and metadata_changed(stored[cid], chunk.metadata)
+        ]
+        if page_maps.get(filename):
+            kept = set(stored) - in_scope - set(ids)
+            renumbered = [(cid, renumber_pages(stored[cid], page_maps[filename])) for cid in kept]
+            file_refreshed += [(cid, m) for cid, m in renumbered if metadata_changed(stored[cid], m)]
+        stale += [(filename, cid) for cid in file_stale]
+        new += file_new
+        keyword_only += file_keyword_only
+        refreshed += file_refreshed
+        added = len(file_new) + len(file_keyword_only)
+        summaries[filename] = {
+            "added": added, "unchanged": len(ids) - added, "removed": len(file_stale),
+            "chunks": len(stored) - len(file_stale) + len(file_new),
+        }
+        print(
+            f"Indexed '{filename}': {added} new, {len(ids) - added} unchanged "
+            f"({len(file_refreshed)} with new metadata), {len(file_stale)} removed chunks"
+        )
+
+    # BM25 follows every vector store write that succeeded, and whatever changed
+    # is saved and versioned even if a later write fails
+    store = get_vector_store()
+    changed = set()
+    try:
+        if stale:
+            store.delete(ids=[cid for _, cid in stale])
+            for filename in {filename for filename, _ in stale}:
+                bm25_index.remove(filename, [cid for f, cid in stale if f == filename])
+            changed |= {filename for filename, _ in stale}
+        if keyword_only:
+            changed |= bm25_index.add(*zip(*keyword_only))
+        batch_size = settings.VECTOR_STORE_BATCH_SIZE
+        for i in range(0, len(new), batch_size):
+            new_ids, new_chunks = zip(*new[i:i + batch_size])
+            store.add_documents(list(new_chunks), ids=list(new_ids))
+            changed |= bm25_index.add(new_ids, new_chunks)
+        if refreshed:
+            refreshed_ids = [cid for cid, _ in refreshed]
+            refreshed_metadatas = [m for _, m in refreshed]
+            update_chunk_metadata(refreshed_ids, refreshed_metadatas)
+            changed |= bm25_index.update_metadata(refreshed_ids, refreshed_metadatas)
+            changed |= {m["filename"] for m in refreshed_metadatas}
+    finally:
+        if changed:
+            bm25_index.save(filenames=sorted(changed))
+            bump_corpus_version()
+    return summaries
+
+def index_file_chunks(filename, chunks, pages=None):
+    '''
+    index_files for a single file
+    '''
+    return index_files([(filename, chunks, pages)])[filename]
+
+@dataclass
+class IngestPlan:
+    fingerprints: Optional[dict]        # page fingerprints of the new upload
+    pages: Optional[set] = None         # stored pages being replaced, None = whole file
+    pages_to_convert: Optional[set] = None  # pages of the upload to convert, None = everything
+    page_map: Optional[dict] = None     # stored page -> page of the upload, for kept pages that moved
+    unchanged: bool = False
+    content_hash: Optional[str] = None  # sha256 of the uploaded bytes, if known
+    size: Optional[int] = None          # bytes of the upload
+
+    @property
+    def needs_conversion(self):
+        return not self.unchanged and (self.pages_to_convert is None or bool(self.pages_to_convert))
+
+def plan_ingest(file_path, filename, incremental=False, content_hash=None):
+    '''
+    Decide what has to be converted. A byte-identical re-upload is skipped
+    outright. In incremental mode old and new pages are matched by
+    fingerprint, so only new or edited pages are converted and re-indexed,
+    removed pages are dropped, and pages that just moved (after an inserted or
+    removed page) keep their chunks under the new page numbers.
+    '''
+    size = os.path.getsize(file_path)
+    if content_hash and content_hash == get_fingerprint_store().get_content_hash(filename):
+        print(f"'{filename}' is identical to the indexed copy, skipping.")
+        return IngestPlan(fingerprints=None, pages=set(), unchanged=True, content_hash=content_hash, size=size)
+
+    fingerprints = compute_page_fingerprints(file_path)
+    previous = get_fingerprint_store().get(filename) if incremental and fingerprints else {}
+    if not previous:
+        return IngestPlan(fingerprints=fingerprints, content_hash=content_hash, size=size)
+
+    page_map = match_pages(previous, fingerprints)
+    changed = set(fingerprints) - set(page_map.values())    # numbered as in the upload
+    removed = set(previous) - set(page_map)                 # numbered as stored
+    if not changed and not removed:
+        print(f"'{filename}' is unchanged, skipping.")
+        return IngestPlan(fingerprints=fingerprints, pages=set(), unchanged=True, content_hash=content_hash, size=size)
+
+    # Chunks can span pages, so also rebuild the matched pages that share a chunk with a changed one
+    scope = expand_to_chunk_spans(filename, removed, page_map)
+    to_convert = changed | {page_map[p] for p in scope if p in page_map}
+    moved = {old: new for old, new in page_map.items() if old != new and old not in scope}
+    print(
+        f"Re-ingesting {len(changed)} new or changed and {len(removed)} removed page(s) of '{filename}' "
+        f"({len(to_convert)} page(s) to convert, {len(moved)} moved)"
+    )
+    return IngestPlan(
+        fingerprints=fingerprints, pages=scope, pages_to_convert=to_convert, page_map=moved,
+        content_hash=content_hash, size=size
+    )
+
+def commit_ingest(filename, chunks, plan):
+    '''
+    Index converted chunks according to the plan and record the new fingerprints,
+    content hash and file registry entry. Returns a summary dict, or None if
+    nothing could be extracted.
+    '''
+    return commit_ingest_batch([(filename, chunks, plan)])[filename]
+
+def commit_ingest_batch(items):
+    '''
+    commit_ingest for several (filename, chunks, plan) items with one
+    index_files call, so the whole batch bumps the corpus version once.
+    Filenames must be unique. Returns {filename: summary or None}.
+    '''
+    store = get_fingerprint_store()
+    summaries, to_index = {}, []
+    for filename, chunks, plan in items:
+        if plan.unchanged:
+            summaries[filename] = {"added": 0, "unchanged": None, "removed": 0, "pages": []}
+        elif not chunks and plan.pages is None:
+            summaries[filename] = None
+        else:
+            to_index.append((filename, chunks, plan.pages))
+
+    unchanged = [filename for filename, summary in summaries.items() if summary is not None]
+    for filename, stored in get_files_chunks(unchanged).items():
+        summaries[filename]["unchanged"] = summaries[filename]["chunks"] = len(stored)
+    page_maps = {filename: plan.page_map for filename, _, plan in items if plan.page_map}
+    summaries.update(index_files(to_index, page_maps) if to_index else {})
+
+    for filename, chunks, plan in items:
+        summary = summaries[filename]
+        if summary is None:
+            continue
+        if not plan.unchanged:
+            summary["pages"] = sorted(plan.pages) if plan.pages is not None else None
+            if plan.fingerprints:
+                store.replace(filename, plan.fingerprints)
+        if plan.content_hash:
+            store.set_content_hash(filename, plan.content_hash)
+        register_file(filename, plan, summary.pop("chunks"))
+    return summaries
+
+def register_file(filename, plan, chunk_count):
+    record = {
+        "filename": filename,
+        "chunk_count": chunk_count,
+        "ingested_at": time.time(),
+        "embedding_model": settings.EMBEDDING_MODEL_NAME,
+    }
+    if plan.content_hash: record["content_hash"] = plan.content_hash
+    if plan.fingerprints: record["page_count"] = len(plan.fingerprints)
+    if plan.size is not None: record["size_bytes"] = plan.size
+    get_file_registry().upsert([record])
+
+def ingest_file(file_path, filename, incremental=False, content_hash=None):
+    '''
+    Convert, split and index one uploaded file in the calling process
+    '''
+    plan = plan_ingest(file_path, filename, incremental=incremental, content_hash=content_hash)
+    chunks = convert_file(file_path, filename, pages=plan.pages_to_convert) if plan.needs_conversion else []
+    return commit_ingest(filename, chunks, plan)
+
+def delete_file_chunks(filename):
+    return delete_files([filename])[filename]
+
+def delete_files(filenames):
+    '''
+    Remove several files from every store with one vector store delete, one
+    BM25 save and one corpus version bump.
+    Returns {filename: "deleted" | "not_found"}, judged by the file registry.
+    '''
+    filenames = list(dict.fromkeys(filenames))
+    if not filenames:
+        return {}
+    registry = get_file_registry()
+    results = {filename: "deleted" if registry.get(filename) else "not_found" for filename in filenames}
+
+    # Also clears chunks of files the registry doesn't know about
+    where = {"filename": {"$in": filenames}} if len(filenames) > 1 else {"filename": filenames[0]}
+    get_vector_store().delete(where=where)
+    get_fingerprint_store().delete(filenames)
+    registry.delete(filenames)
+
+    bm25_index = get_bm25_index()
+    for filename in filenames:
+        bm25_index.remove_file(filename)
+    bm25_index.save(filenames=filenames)
+    bump_corpus_version()
+    return results
+
+def rebuild_file_registry():
+    '''
+    Fill the registry from the vector store's metadata, for files indexed
+    before it existed. One full scan, run when the registry is empty.
+    '''
+    data = get_vector_store().get(include=["metadatas"])
+    files = {}
+    for m in data.get("metadatas") or []:
+        if not m or not m.get("filename"):
+            continue
+        entry = files.setdefault(m["filename"], {"filename": m["filename"], "chunk_count": 0, "page_count": 0})
+        entry["chunk_count"] += 1
+        entry["page_count"] = max(entry["page_count"], m.get("page_end", m.get("page_number")) or 0)
+
+    hashes = get_fingerprint_store()
+    now = time.time()
+    for entry in files.values():
+        entry.update({"ingested_at": now, "content_hash": hashes.get_content_hash(entry["filename"])})
+        entry["page_count"] = entry["page_count"] or None
+    get_file_registry().upsert(list(files.values()))
+    return len(files)
@@ -0,0 +1,76 @@
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from config.settings import settings
+
+COLUMNS = ("filename", "content_hash", "page_count", "chunk_count", "size_bytes", "ingested_at", "embedding_model")
+
+class FileRegistry:
+    '''
+    One row per indexed file, kept up to date by ingestion and deletion, so
+    listing files never has to scan the vector store
+    '''
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "filename TEXT PRIMARY KEY, content_hash TEXT, page_count INTEGER, chunk_count INTEGER NOT NULL, "
+            "size_bytes INTEGER, ingested_at REAL NOT NULL, embedding_model TEXT)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def get(self, filename):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM files WHERE filename = ?", (filename,)
+            ).fetchone()
+        return dict(zip(COLUMNS, row)) if row else None
+
+    def list(self, offset=0, limit=100, search=None):
+        '''
+        A page of records in filename order, and the total number of matches
+        '''
+        where, params = "", ()
+        if search:
+            where, params = "WHERE filename LIKE ? ESCAPE '\\'", (f"%{escape_like(search)}%",)
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM files {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM files {where} ORDER BY filename LIMIT ? OFFSET ?",
+                (*params, limit, offset),
+            ).fetchall()
+        return [dict(zip(COLUMNS, row)) for row in rows], total
+
+    def upsert(self, records):
+        '''
+        Insert or update records; fields missing from a record keep their stored value
+        '''
+        with self._lock:
+            for record in records:
+                fields = [c for c in COLUMNS if c in record]
+                updates = ", ".join(f"{c} = excluded.{c}" for c in fields if c != "filename")
+                self._conn.execute(
+                    f"INSERT INTO files ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))}) "
+                    f"ON CONFLICT(filename) DO UPDATE SET {updates}",
+                    [record[c] for c in fields],
+                )
+            self._conn.commit()
+
+    def delete(self, filenames):
+        with self._lock:
+            self._conn.executemany("DELETE FROM files WHERE filename = ?", [(f,) for f in filenames])
+            self._conn.commit()
+
+def escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+@lru_cache(maxsize=1)
+def get_file_registry():
+    return FileRegistry(os.path.join(settings.DATA_DIR, "files.sqlite3"))
@@ -1,28 +1,170 @@
-from langchain_text_splitters import RecursiveCharacterTextSplitter, MarkdownHeaderTextSplitter
+import re
+from functools import lru_cache
+from langchain_core.documents import Document
+from config.settings import settings
+
+HEADER_PATTERN = re.compile(r"^(#{1,3})\s+(.*\S)\s*$")
+HEADER_KEYS = {1: "Title", 2: "Section", 3: "Subsection"}
+BLOCK_SEPARATOR = re.compile(r"\n\s*\n")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+@lru_cache(maxsize=1)
+def get_tokenizer():
+    '''
+    The embedding model's tokenizer, so chunk budgets match what the model sees
+    '''
+    try:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(settings.EMBEDDING_MODEL_NAME)
+        tokenizer.model_max_length = 10 ** 9    # only used for counting
+        return tokenizer
+    except Exception as e:
+        print(f"Tokenizer for '{settings.EMBEDDING_MODEL_NAME}' unavailable, estimating tokens: {e}")
+        return None
+
+def count_tokens(texts):
+    if not texts:
+        return []
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return [max(1, len(text) // 4) for text in texts]
+    return [len(ids) for ids in tokenizer(list(texts), add_special_tokens=False)["input_ids"]]
+
+def document_sections(documents):
+    '''
+    Walk the pages in order and group their text blocks under the current
+    header path, which carries over page breaks.
+    Yields (header_path, [(block_text, pages), ...]) with header_path as {level: header}.
+    '''
+    path, blocks = {}, []
+    for doc in sorted(documents, key=lambda d: d.metadata.get("page_number", 0)):
+        page = doc.metadata.get("page_number")
+        for i, block in enumerate(BLOCK_SEPARATOR.split(doc.page_content)):
+            pages = (page,)
+            # A paragraph cut by the page break continues the previous page's last block
+            if i == 0 and blocks and block[:1].islower() and not blocks[-1][0].endswith((".", "!", "?", ":")):
+                text, previous_pages = blocks.pop()
+                block = f"{text} {block.lstrip()}"
+                pages = previous_pages + pages
+            lines = []
+            for line in block.strip().splitlines():
+                match = HEADER_PATTERN.match(line)
+                if not match:
+                    lines.append(line)
+                    continue
+
+                if lines:
+                    blocks.append(("\n".join(lines), pages))
+                    lines = []
+                if blocks:
+                    yield path, blocks
+                    blocks = []
+                level = len(match.group(1))
+                path = {lvl: name for lvl, name in path.items() if lvl < level}
+                path[level] = match.group(2)
+            if lines:
+                blocks.append(("\n".join(lines), pages))
+    if blocks:
+        yield path, blocks
+
+def split_oversized(text, max_tokens):
+    '''
+    Cut a block longer than the budget at sentence boundaries, and a sentence
+    longer than the budget at word boundaries. Returns [(text, tokens)].
+    '''
+    sentences = [s for s in SENTENCE_END.split(text) if s.strip()]
+    pieces = []
+    for sentence, tokens in zip(sentences, count_tokens(sentences)):
+        if tokens <= max_tokens:
+            pieces.append((sentence, tokens))
+            continue
+        words = sentence.split()
+        window = []
+        for word, word_tokens in zip(words, count_tokens(words)):
+            if window and sum(t for _, t in window) + word_tokens > max_tokens:
+                pieces.append((" ".join(w for w, _ in window), sum(t for _, t in window)))
+                window = []
+            window.append((word, word_tokens))
+        if window:
+            pieces.append((" ".join(w for w, _ in window), sum(t for _, t in window)))
+    return pieces
+
+def pack_section(blocks, max_tokens, overlap_tokens):
+    '''
+    Greedily fill chunks of up to max_tokens with a section's blocks.
+    When a section needs several chunks, the next one repeats the previous
+    chunk's last sentence if it fits in overlap_tokens.
+    Returns [(text, tokens, pages)].
+    '''
+    pieces = []
+    for (text, block_pages), tokens in zip(blocks, count_tokens([text for text, _ in blocks])):
+        if tokens <= max_tokens:
+            pieces.append((text, tokens, block_pages))
+        else:
+            pieces.extend((part, part_tokens, block_pages) for part, part_tokens in split_oversized(text, max_tokens))
+
+    chunks, parts, total, pages, last_pages = [], [], 0, set(), ()
+    for text, tokens, block_pages in pieces:
+        if parts and total + tokens > max_tokens:
+            chunks.append(("\n\n".join(parts), total, pages))
+            parts, total, pages = [], 0, set()
+
+            # The repeated sentence brings only the pages of the piece it came from
+            last_sentence = SENTENCE_END.split(chunks[-1][0])[-1].strip()
+            last_tokens = count_tokens([last_sentence])[0] if overlap_tokens else 0
+            if overlap_tokens and last_tokens <= overlap_tokens and last_tokens + tokens <= max_tokens:
+                parts, total, pages = [last_sentence], last_tokens, set(last_pages)
+        parts.append(text)
+        total += tokens
+        pages.update(block_pages)
+        last_pages = block_pages
+    if parts:
+        chunks.append(("\n\n".join(parts), total, pages))
+    return chunks
+
+def header_lines(path, skip_levels):
+    return [f"{'#' * level} {name}" for level, name in sorted(path.items()) if level not in skip_levels]
 
 def split_documents(documents):
     '''
-    Split the Markdown result into multiple chunk base on its header
-    '''
-    headers_to_split_on = [("#", "Title"), ("##", "Section"), ("###", "Subsection")]
-    markdown_splitter = MarkdownHeaderTextSplitter(headers_to_split_on=headers_to_split_on)
-    
-    # Split by word if the chunk is too long
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000, chunk_overlap=200, length_function=len
-    )
-    
-    final_chunks = []
-    for doc in documents:
-        # Split markdown headers
-        splits = markdown_splitter.split_text(doc.page_content)
-
-        # Copy metadata to splits
-        for split in splits:
-            split.metadata.update(doc.metadata)
-            
-        # Split by char
-        char_splits = text_splitter.split_documents(splits)
-        final_chunks.extend(char_splits)
-    
-    return final_chunks
\ No newline at end of file
+    Chunk a whole document by its Markdown structure, sized in embedding-model tokens.
+    Sections keep their header path across pages, neighbouring sections below
+    CHUNK_MIN_TOKENS share a chunk, and long sections are cut at block or
+    sentence boundaries. Every chunk records the pages it spans.
+    '''
+    if not documents:
+        return []
+    max_tokens = settings.CHUNK_MAX_TOKENS
+    base_metadata = {k: v for k, v in documents[0].metadata.items() if k != "page_number"}
+
+    chunks = []     # [path, text, tokens, pages, can_merge]
+    for path, blocks in document_sections(documents):
+        packed = pack_section(blocks, max_tokens, settings.CHUNK_OVERLAP_TOKENS)
+        # Only a section that fits in one chunk may later be folded into the next one
+        whole = len(packed) == 1
+        prev = chunks[-1] if chunks else None
+        if prev and prev[4] and prev[2] < settings.CHUNK_MIN_TOKENS:
+            # Fold a small previous section into this one's first chunk, keeping
+            # the shared part of the header path in metadata and the rest inline
+            text, tokens, pages = packed[0]
+            shared = {lvl: name for lvl, name in prev[0].items() if path.get(lvl) == name}
+            prev_lines = header_lines(prev[0], shared) if prev[0] != shared else []
+            folded = "\n\n".join(prev_lines + [prev[1]] + header_lines(path, shared) + [text])
+            folded_tokens = count_tokens([folded])[0]
+            if folded_tokens <= max_tokens:
+                packed.pop(0)
+                prev[0], prev[1], prev[2] = shared, folded, folded_tokens
+                prev[3] |= pages
+                prev[4] = whole
+        for text, tokens, pages in packed:
+            chunks.append([path, text, tokens, set(pages), whole])
+
+    output = []
+    for path, text, _, pages, _ in chunks:
+        metadata = dict(base_metadata)
+        metadata.update({HEADER_KEYS[level]: name for level, name in path.items()})
+        pages = {p for p in pages if p is not None}
+        if pages:
+            metadata.update({"page_number": min(pages), "page_start": min(pages), "page_end": max(pages)})
+        output.append(Document(page_content=text, metadata=metadata))
+    return output
@@ -0,0 +1,132 @@
+import re
+import statistics
+import pypdfium2.raw as pdfium_c
+from config.settings import settings
+
+BULLET_PATTERN = re.compile(r"^\s*[•◦▪▫■□●○‣⁃–-]\s+")
+
+def font_size(textpage, left, bottom, right, top):
+    '''
+    Font size of the first character in a text rectangle; glyph heights vary
+    with the letters used, the font size does not
+    '''
+    index = textpage.get_index(left + min(1.0, (right - left) / 2), (top + bottom) / 2, 1.0, 1.0)
+    if index is None or index < 0:     # no character hit: None in pypdfium2 5.x, -1 before
+        return top - bottom
+    return pdfium_c.FPDFText_GetFontSize(textpage.raw, index)
+
+def page_lines(textpage):
+    '''
+    Group the text layer's rectangles into lines, top to bottom.
+    Each line is {"text", "left", "right", "top", "bottom", "height", "size", "cells"},
+    where size is the largest font size on the line and cells counts runs
+    separated by wide horizontal gaps (table-like rows).
+    '''
+    rects = []
+    for i in range(textpage.count_rects()):
+        left, bottom, right, top = textpage.get_rect(i)
+        text = textpage.get_text_bounded(left, bottom, right, top).strip()
+        if text:
+            rects.append({
+                "text": text, "left": left, "right": right, "top": top, "bottom": bottom,
+                "size": font_size(textpage, left, bottom, right, top),
+            })
+
+    lines = []
+    for rect in sorted(rects, key=lambda r: (-r["top"], r["left"])):
+        middle = (rect["top"] + rect["bottom"]) / 2
+        line = lines[-1] if lines else None
+        if line and line["bottom"] <= middle <= line["top"]:
+            line["parts"].append(rect)
+            line["left"] = min(line["left"], rect["left"])
+            line["right"] = max(line["right"], rect["right"])
+            continue
+        lines.append({**rect, "parts": [rect]})
+
+    for line in lines:
+        parts = sorted(line.pop("parts"), key=lambda r: r["left"])
+        line["text"] = " ".join(p["text"] for p in parts)
+        line["height"] = max(p["top"] - p["bottom"] for p in parts)
+        line["size"] = max(p["size"] for p in parts)
+        line["cells"] = 1 + sum(
+            1 for a, b in zip(parts, parts[1:]) if b["left"] - a["right"] > 2 * line["height"]
+        )
+    return lines
+
+def classify_page(page, textpage, lines):
+    '''
+    Decide whether a page can be taken from the text layer ("text") or needs
+    docling's layout pipeline ("docling"): no text layer, large images,
+    ruled tables or drawings, or multi-column text.
+    '''
+    if textpage.count_chars() < settings.TEXT_LAYER_MIN_CHARS or not lines:
+        return "docling"
+
+    width, height = page.get_size()
+    image_area, n_paths = 0.0, 0
+    for obj in page.get_objects(filter=[pdfium_c.FPDF_PAGEOBJ_IMAGE, pdfium_c.FPDF_PAGEOBJ_PATH]):
+        if obj.type == pdfium_c.FPDF_PAGEOBJ_PATH:
+            n_paths += 1
+            continue
+        left, bottom, right, top = obj.get_bounds()
+        image_area += max(0.0, right - left) * max(0.0, top - bottom)
+    if image_area > settings.TEXT_LAYER_MAX_IMAGE_AREA * width * height:
+        return "docling"
+    if n_paths > settings.TEXT_LAYER_MAX_PATHS:
+        return "docling"
+
+    # Several lines sharing a row, or many narrow lines starting mid-page: tables or columns
+    if sum(1 for line in lines if line["cells"] >= 3) > 3:
+        return "docling"
+    right_column = [l for l in lines if l["left"] > 0.45 * width and l["right"] - l["left"] < 0.5 * width]
+    if len(lines) >= 10 and len(right_column) > 0.3 * len(lines):
+        return "docling"
+    return "text"
+
+def heading_level(line, body_size):
+    if len(line["text"]) > 120 or line["text"].endswith((".", ",", ";")):
+        return 0
+    ratio = line["size"] / body_size
+    if ratio >= 1.8:
+        return 1
+    if ratio >= 1.4:
+        return 2
+    if ratio >= 1.15:
+        return 3
+    return 0
+
+def lines_to_markdown(lines):
+    '''
+    Rebuild Markdown from text lines: larger fonts become #/##/### headers,
+    bullets become list items and vertical gaps separate paragraphs
+    '''
+    if not lines:
+        return ""
+    body_size = statistics.median(l["size"] for l in lines) or 1.0
+    body_height = statistics.median(l["height"] for l in lines) or 1.0
+
+    blocks, paragraph, previous = [], [], None
+    def flush():
+        if paragraph:
+            blocks.append(" ".join(paragraph))
+            paragraph.clear()
+
+    for line in lines:
+        text = line["text"]
+        level = heading_level(line, body_size)
+        if level:
+            flush()
+            if blocks and blocks[-1].startswith("#" * level + " ") and previous and previous["size"] == line["size"]:
+                blocks[-1] += f" {text}"     # heading wrapped onto a second line
+            else:
+                blocks.append(f"{'#' * level} {text}")
+        elif BULLET_PATTERN.match(text):
+            flush()
+            paragraph.append(BULLET_PATTERN.sub("- ", text))
+        else:
+            if previous and previous["bottom"] - line["top"] > 0.8 * body_height:
+                flush()
+            paragraph.append(text)
+        previous = line
+    flush()
+    return "\n\n".join(blocks)
@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import hashlib
+import tempfile
+from collections import defaultdict
+from functools import lru_cache
+from config.settings import settings
+
+class UploadError(Exception):
+    pass
+
+class UploadOffsetError(UploadError):
+    def __init__(self, offset):
+        super().__init__(f"Upload offset mismatch, resume from byte {offset}.")
+        self.offset = offset
+
+def new_workdir():
+    '''
+    Unique directory for one batch of uploads, so equal filenames never collide
+    '''
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    return tempfile.mkdtemp(dir=settings.UPLOAD_DIR)
+
+def upload_path(workdir, index, filename):
+    '''
+    Path for the index-th file of a batch. Each file gets its own subdirectory,
+    so it keeps its original name while equal names in a batch can't collide.
+    '''
+    directory = os.path.join(workdir, str(index))
+    os.makedirs(directory)
+    return os.path.join(directory, filename)
+
+def write_chunk(out, digest, chunk):
+    digest.update(chunk)
+    out.write(chunk)
+
+async def spool_upload(file, path):
+    '''
+    Stream a multipart upload to disk in chunks, hashing while writing.
+    File I/O and hashing run in threads, off the event loop.
+    Returns (size, sha256 hex digest).
+    '''
+    digest = hashlib.sha256()
+    size = 0
+    out = await asyncio.to_thread(open, path, "wb")
+    try:
+        while chunk := await file.read(settings.UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > settings.UPLOAD_MAX_BYTES:
+                raise UploadError(f"'{file.filename}' is larger than {settings.UPLOAD_MAX_BYTES} bytes.")
+            await asyncio.to_thread(write_chunk, out, digest, chunk)
+    finally:
+        await asyncio.to_thread(out.close)
+    return size, digest.hexdigest()
+
+class UploadSessions:
+    '''
+    Resumable chunked uploads. Each session spools to its own part file under
+    UPLOAD_DIR/sessions/<id>; chunks are appended at the current offset and
+    hashed as they arrive, so an interrupted upload resumes where it stopped.
+    '''
+    def __init__(self, root, ttl):
+        self.root = root
+        self.ttl = ttl
+        self._digests = {}                      # upload id -> (sha256 object, offset)
+        self._locks = defaultdict(asyncio.Lock)
+
+    def _dir(self, upload_id):
+        if not upload_id.isalnum():
+            raise KeyError(upload_id)
+        return os.path.join(self.root, upload_id)
+
+    def _part_path(self, upload_id):
+        return os.path.join(self._dir(upload_id), "data.part")
+
+    def _load_meta(self, upload_id):
+        try:
+            with open(os.path.join(self._dir(upload_id), "meta.json"), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise KeyError(upload_id)
+
+    def create(self, filename, size):
+        if size > settings.UPLOAD_MAX_BYTES:
+            raise UploadError(f"'{filename}' is larger than {settings.UPLOAD_MAX_BYTES} bytes.")
+        self.expire()
+
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._dir(upload_id))
+        meta = {"upload_id": upload_id, "filename": os.path.basename(filename), "size": size, "created_at": time.time()}
+        with open(os.path.join(self._dir(upload_id), "meta.json"), "w") as f:
+            json.dump(meta, f)
+        open(self._part_path(upload_id), "wb").close()
+        self._digests[upload_id] = (hashlib.sha256(), 0)
+        return {**meta, "offset": 0}
+
+    def status(self, upload_id):
+        meta = self._load_meta(upload_id)
+        return {**meta, "offset": os.path.getsize(self._part_path(upload_id))}
+
+    def _digest(self, upload_id, offset):
+        digest, hashed = self._digests.get(upload_id, (None, -1))
+        if digest is None or hashed != offset:
+            # e.g. after a restart: rebuild the running hash from the bytes on disk
+            digest = hashlib.sha256()
+            with open(self._part_path(upload_id), "rb") as f:
+                while block := f.read(settings.UPLOAD_CHUNK_SIZE):
+                    digest.update(block)
+        return digest
+
+    async def append(self, upload_id, offset, chunks):
+        '''
+        Append an async iterator of byte chunks at offset. Returns the new offset.
+        '''
+        async with self._locks[upload_id]:
+            meta = self.status(upload_id)
+            if offset != meta["offset"]:
+                raise UploadOffsetError(meta["offset"])
+
+            digest = await asyncio.to_thread(self._digest, upload_id, offset)
+            size = offset
+            out = await asyncio.to_thread(open, self._part_path(upload_id), "ab")
+            try:
+                async for chunk in chunks:
+                    if size + len(chunk) > meta["size"]:
+                        raise UploadError("Upload is larger than announced.")
+                    await asyncio.to_thread(write_chunk, out, digest, chunk)
+                    size += len(chunk)
+            finally:
+                await asyncio.to_thread(out.close)
+                # Whatever reached the disk counts; the client resumes from there
+                self._digests[upload_id] = (digest, size)
+            return size
+
+    def finish(self, upload_id, workdir):
+        '''
+        Move a completed upload into workdir.
+        Returns (path, filename, sha256 hex digest).
+        '''
+        meta = self.status(upload_id)
+        if meta["offset"] != meta["size"]:
+            raise UploadOffsetError(meta["offset"])
+
+        digest = self._digest(upload_id, meta["offset"])
+        os.makedirs(os.path.join(workdir, upload_id))    # uploads in one batch may share a filename
+        path = os.path.join(workdir, upload_id, meta["filename"])
+        shutil.move(self._part_path(upload_id), path)
+        self.discard(upload_id)
+        return path, meta["filename"], digest.hexdigest()
+
+    def discard(self, upload_id):
+        shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+        self._digests.pop(upload_id, None)
+        self._locks.pop(upload_id, None)
+
+    def expire(self):
+        if not os.path.isdir(self.root):
+            return
+        cutoff = time.time() - self.ttl
+        for upload_id in os.listdir(self.root):
+            try:
+                if self._load_meta(upload_id)["created_at"] < cutoff:
+                    self.discard(upload_id)
+            except (KeyError, ValueError):
+                self.discard(upload_id)
+
+@lru_cache(maxsize=1)
+def get_upload_sessions():
+    return UploadSessions(
+        root=os.path.join(settings.UPLOAD_DIR, "sessions"),
+        ttl=settings.UPLOAD_SESSION_TTL,
+    )
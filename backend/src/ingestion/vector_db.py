@@ -1,29 +1,84 @@
+import os
+import time
+import chromadb
+from chromadb.config import Settings as ChromaSettings
 from functools import lru_cache
 from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
+from src.ingestion.memmap_store import MemmapVectorStore
 from config.settings import settings
+from src.ingestion.embeddings import build_embedding_engine
+from src.ingestion.embedding_cache import CachedEmbeddings
 
 @lru_cache(maxsize=1)
 def get_embedding_function():
     """
     Returns the embedding function. 
     Cached to prevent reloading the model on every request.
+    Document embeddings are also cached on disk by content hash.
     """
-    embedding_fn = HuggingFaceEmbeddings(
+    return CachedEmbeddings(
+        build_embedding_engine(),
         model_name=settings.EMBEDDING_MODEL_NAME,
-        model_kwargs={"device": "cuda"},
-        encode_kwargs={"normalize_embeddings": True}
+        path=os.path.join(settings.DATA_DIR, "embedding_cache.sqlite3")
     )
-    return embedding_fn
 
+@lru_cache(maxsize=1)
+def get_chroma_client():
+    """
+    Process-wide Chroma HTTP client. Its connection pool keeps connections
+    alive between requests, so queries don't pay for connection setup.
+    """
+    return chromadb.HttpClient(
+        host=settings.CHROMA_HOST,
+        port=settings.CHROMA_PORT,
+        settings=ChromaSettings(
+            anonymized_telemetry=False,
+            chroma_http_keepalive_secs=settings.HTTP_KEEPALIVE_SECS,
+            chroma_http_max_connections=settings.CHROMA_MAX_CONNECTIONS,
+            chroma_http_max_keepalive_connections=settings.CHROMA_MAX_CONNECTIONS,
+        ),
+    )
+
+@lru_cache(maxsize=1)
 def get_vector_store():
     """
-    Returns the ChromaDB instance using the custom embedding function
+    Returns the vector store selected by VECTOR_STORE_BACKEND, using the custom embedding function.
+    Shared by all requests; it holds no per-request state.
+    chroma: the remote Chroma server. memmap: an in-process store under VECTOR_STORE_DIR.
     """
+    if settings.VECTOR_STORE_BACKEND == "memmap":
+        return MemmapVectorStore(
+            settings.VECTOR_STORE_DIR,
+            embedding_function=get_embedding_function(),
+            dtype=settings.VECTOR_STORE_DTYPE,
+        )
     return Chroma(
         collection_name="academic_docs",
         embedding_function=get_embedding_function(),
-        client_settings=None,
-        host=settings.CHROMA_HOST,
-        port=settings.CHROMA_PORT
-    )
\ No newline at end of file
+        client=get_chroma_client(),
+    )
+
+def update_chunk_metadata(ids, metadatas):
+    """
+    Replace the metadata of stored chunks without re-embedding them
+    """
+    store = get_vector_store()
+    batch_size = settings.VECTOR_STORE_BATCH_SIZE
+    for i in range(0, len(ids), batch_size):
+        if settings.VECTOR_STORE_BACKEND == "memmap":
+            store.update_metadatas(ids[i:i + batch_size], metadatas[i:i + batch_size])
+        else:
+            store._collection.update(ids=ids[i:i + batch_size], metadatas=metadatas[i:i + batch_size])
+
+def vector_store_health():
+    """
+    Heartbeat round trip over the pooled Chroma client, or the chunk count of the embedded store
+    """
+    start = time.perf_counter()
+    try:
+        if settings.VECTOR_STORE_BACKEND == "memmap":
+            return {"ok": True, "backend": "memmap", "chunks": len(get_vector_store())}
+        get_chroma_client().heartbeat()
+        return {"ok": True, "backend": "chroma", "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
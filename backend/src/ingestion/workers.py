@@ -0,0 +1,23 @@
+from src.ingestion.loader import load_file_with_docling, get_docling_converter
+from src.ingestion.splitter import split_documents
+
+def init_worker():
+    '''
+    Process-pool initializer: build this worker's docling converter up front
+    '''
+    get_docling_converter()
+
+def convert_pages(file_path, pages):
+    '''
+    Convert one page range of a large PDF; the parent merges and splits the results
+    '''
+    return load_file_with_docling(file_path, pages=pages)
+
+def convert_file(file_path, filename, pages=None):
+    '''
+    CPU-heavy half of ingestion (docling conversion + splitting).
+    Kept free of vector store imports so it can run in a worker process.
+    '''
+    raw_docs = load_file_with_docling(file_path, pages=pages)
+    for doc in raw_docs: doc.metadata["filename"] = filename
+    return split_documents(raw_docs)
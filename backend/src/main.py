@@ -1,8 +1,18 @@
-import httpx
+import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from src.api import chat, documents
+from src.ingestion.bm25_index import get_bm25_index
+from src.chatbot.reranker import get_reranker
+from src.ingestion.vector_db import get_embedding_function, vector_store_health
+from src.chatbot.retrieval_cache import get_retrieval_cache, save_retrieval_cache
+from src.chatbot.scheduler import get_generation_scheduler
+from src.chatbot.client import get_ollama_http, ollama_health
+from src.ingestion.jobs import get_job_manager
+from src.ingestion.registry import get_file_registry
+from src.ingestion.pipeline import rebuild_file_registry
+from src import metrics
 from config.settings import settings
 
 @asynccontextmanager
@@ -16,38 +26,71 @@ async def lifespan(app):
 
     print(f"Checking model availability: {target_model}...")
     
-    async with httpx.AsyncClient() as client:
-        try:
-            # Check if model exists
-            resp = await client.get(f"{ollama_url}/api/tags")
-            existing_models = [m['name'] for m in resp.json().get('models', [])]
+    client = get_ollama_http()
+    try:
+        # Check if model exists
+        resp = await client.get(f"{ollama_url}/api/tags")
+        existing_models = [m['name'] for m in resp.json().get('models', [])]
+        
+        # Check for exact match or has :latest tag
+        if target_model not in existing_models and f"{target_model}:latest" not in existing_models:
+            print(f"Model '{target_model}' not found. Pulling from Ollama library...")
+            print("(This may take a while depending on file size...)")
             
-            # Check for exact match or has :latest tag
-            if target_model not in existing_models and f"{target_model}:latest" not in existing_models:
-                print(f"Model '{target_model}' not found. Pulling from Ollama library...")
-                print("(This may take a while depending on file size...)")
-                
-                # Trigger Pull
-                pull_resp = await client.post(
-                    f"{ollama_url}/api/pull", 
-                    json={"name": target_model, "stream": False},
-                    timeout=None 
-                )
-                
-                if pull_resp.status_code == 200:
-                    print(f"Successfully pulled '{target_model}'!")
-                else:
-                    print(f"Failed to pull model: {pull_resp.text}")
+            # Trigger Pull
+            pull_resp = await client.post(
+                f"{ollama_url}/api/pull", 
+                json={"name": target_model, "stream": False},
+                timeout=None 
+            )
+            
+            if pull_resp.status_code == 200:
+                print(f"Successfully pulled '{target_model}'!")
             else:
-                print(f"Model '{target_model}' is already available.")
-                
-        except Exception as e:
-            print(f"Could not connect to Ollama at {ollama_url}.")
-            print(f"Error details: {e}")
+                print(f"Failed to pull model: {pull_resp.text}")
+        else:
+            print(f"Model '{target_model}' is already available.")
+            
+    except Exception as e:
+        print(f"Could not connect to Ollama at {ollama_url}.")
+        print(f"Error details: {e}")
+
+    # Warm up the keyword index so the first chat request doesn't pay for it
+    try:
+        bm25_index = await asyncio.to_thread(get_bm25_index)
+        print(f"BM25 index ready ({len(bm25_index)} chunks).")
+    except Exception as e:
+        print(f"Could not load BM25 index: {e}")
+
+    try:
+        await asyncio.to_thread(get_embedding_function)
+    except Exception as e:
+        print(f"Could not load embedding model: {e}")
+
+    try:
+        await asyncio.to_thread(get_reranker)
+        print("Reranker loaded.")
+    except Exception as e:
+        print(f"Could not load reranker: {e}")
+
+    try:
+        if len(get_file_registry()) == 0:
+            files = await asyncio.to_thread(rebuild_file_registry)
+            print(f"File registry rebuilt from the vector store ({files} files).")
+    except Exception as e:
+        print(f"Could not rebuild file registry: {e}")
+
+    get_retrieval_cache()
 
     yield 
     
     print("Shutting down Academic Buddy...")
+    get_job_manager().shutdown()
+    await get_ollama_http().aclose()
+    try:
+        save_retrieval_cache()
+    except Exception as e:
+        print(f"Could not save retrieval cache: {e}")
 
 # --- Initialize App ---
 app = FastAPI(
@@ -70,4 +113,21 @@ app.include_router(chat.router, prefix="/chat", tags=["Chat"])
 
 @app.get("/")
 async def root():
-    return {"status": "running", "message": "Academic Buddy Backend is Live"}
\ No newline at end of file
+    return {"status": "running", "message": "Academic Buddy Backend is Live"}
+
+@app.get("/health")
+async def health(response: Response):
+    """
+    Probes the vector store and Ollama over the shared, pooled clients.
+    Answers 503 if either is unreachable.
+    """
+    vector_store, ollama = await asyncio.gather(asyncio.to_thread(vector_store_health), ollama_health())
+    checks = {"vector_store": vector_store, "ollama": ollama}
+    healthy = all(check["ok"] for check in checks.values())
+    if not healthy:
+        response.status_code = 503
+    return {"status": "ok" if healthy else "degraded", "checks": checks}
+
+@app.get("/metrics")
+async def get_metrics():
+    return {**metrics.snapshot(), "generation": get_generation_scheduler().stats()}
\ No newline at end of file
@@ -0,0 +1,42 @@
+import time
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_timings = defaultdict(lambda: {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+
+def increment(name, value=1):
+    with _lock:
+        _counters[name] += value
+
+def observe(name, seconds):
+    '''
+    Record one duration sample for the named stage
+    '''
+    ms = seconds * 1000
+    with _lock:
+        stat = _timings[name]
+        stat["count"] += 1
+        stat["total_ms"] += ms
+        stat["max_ms"] = max(stat["max_ms"], ms)
+
+@contextmanager
+def timer(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+def snapshot():
+    '''
+    Current counters and per-stage timing summaries
+    '''
+    with _lock:
+        timings = {
+            name: {**stat, "avg_ms": stat["total_ms"] / stat["count"] if stat["count"] else 0.0}
+            for name, stat in _timings.items()
+        }
+        return {"counters": dict(_counters), "timings": timings}
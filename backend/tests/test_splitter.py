@@ -0,0 +1,48 @@
+from langchain_core.documents import Document
+from config.settings import settings
+from src.ingestion import splitter
+
+def page(number, text):
+    return Document(page_content=text, metadata={"filename": "notes.pdf", "page_number": number})
+
+def paragraph(page_number):
+    return " ".join(f"Page {page_number} sentence {i} describes one detail of the topic." for i in range(12))
+
+def filler(word, chars):
+    return (f"{word} " * chars)[:chars].strip()
+
+def split(documents, monkeypatch, max_tokens=200, min_tokens=50, overlap_tokens=48):
+    monkeypatch.setattr(splitter, "get_tokenizer", lambda: None)    # 4 characters per token, no model download
+    monkeypatch.setattr(settings, "CHUNK_MAX_TOKENS", max_tokens)
+    monkeypatch.setattr(settings, "CHUNK_MIN_TOKENS", min_tokens)
+    monkeypatch.setattr(settings, "CHUNK_OVERLAP_TOKENS", overlap_tokens)
+    return splitter.split_documents(documents)
+
+def test_page_spans_do_not_accumulate_along_a_section(monkeypatch):
+    documents = [page(1, "# Lecture\n\n" + paragraph(1))] + [page(n, paragraph(n)) for n in range(2, 7)]
+    chunks = split(documents, monkeypatch)
+
+    assert len(chunks) == 6
+    assert chunks[0].metadata["page_start"] == chunks[0].metadata["page_end"] == 1
+    for number, chunk in enumerate(chunks[1:], start=2):
+        # Only the repeated sentence comes from the previous page
+        assert (chunk.metadata["page_start"], chunk.metadata["page_end"]) == (number - 1, number)
+
+def test_folded_chunks_stay_within_budget(monkeypatch):
+    documents = [page(1, "# Short\n\nA brief note.\n\n# Long\n\n" + filler("lorem", 388))]
+    chunks = split(documents, monkeypatch, max_tokens=100, min_tokens=40, overlap_tokens=0)
+
+    for chunk in chunks:
+        assert splitter.count_tokens([chunk.page_content])[0] <= settings.CHUNK_MAX_TOKENS
+
+def test_tail_of_a_split_section_is_not_merged_into_the_next(monkeypatch):
+    text = (
+        "# Intro\n\nIntro note.\n\n"
+        f"# First\n\n{filler('body', 320)}\n\n{filler('tail', 120)}\n\n"
+        "# Second\n\nAnother short section."
+    )
+    chunks = split([page(1, text)], monkeypatch, max_tokens=100, min_tokens=40, overlap_tokens=0)
+
+    second = [chunk for chunk in chunks if "Another short section." in chunk.page_content]
+    assert len(second) == 1
+    assert "tail" not in second[0].page_content
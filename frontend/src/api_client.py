@@ -1,54 +1,226 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
 import json
-from typing import Generator, List, Dict, Any
+import time
+from typing import Generator, List, Dict, Any, Optional
 
 class APIClient:
     def __init__(self):
         # Allow overriding URL via env var, default to docker service name
         self.base_url = os.getenv("BACKEND_URL", "http://backend:8000")
         self.headers = {"accept": "application/json"}
+        # Resumable uploads: bytes per request, per-request timeout and retries per chunk
+        self.upload_chunk_size = int(os.getenv("UPLOAD_CHUNK_SIZE", 4 * 1024 * 1024))
+        self.upload_timeout = int(os.getenv("UPLOAD_TIMEOUT", 60))
+        self.upload_retries = int(os.getenv("UPLOAD_RETRIES", 5))
+        # Chat streams: seconds to connect, and seconds without data before giving up
+        self.connect_timeout = float(os.getenv("BACKEND_CONNECT_TIMEOUT", 5))
+        self.stream_timeout = float(os.getenv("BACKEND_STREAM_TIMEOUT", 300))
+        self.session = self._build_session()
+
+    def _build_session(self) -> requests.Session:
+        """
+        One keep-alive connection pool to the backend for all calls.
+        Connection failures are retried with backoff; reads and 502-504
+        responses only for idempotent methods (uploads retry on their own).
+        """
+        retries = Retry(
+            total=int(os.getenv("BACKEND_RETRIES", 3)),
+            backoff_factor=0.5,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "DELETE"}),
+            raise_on_status=False,
+        )
+        pool_size = int(os.getenv("BACKEND_POOL_SIZE", 10))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retries)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
 
     def get_files(self) -> List[str]:
-        """Fetch list of available files from backend."""
+        """Fetch list of available files from backend, a page at a time."""
+        files = []
         try:
-            response = requests.get(
-                f"{self.base_url}/documents/", 
-                headers=self.headers, 
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json().get("files", [])
+            while True:
+                response = self.session.get(
+                    f"{self.base_url}/documents/", 
+                    params={"offset": len(files)},
+                    headers=self.headers, 
+                    timeout=10
+                )
+                response.raise_for_status()
+                page = response.json()
+                files.extend(page.get("files", []))
+                if not page.get("files") or len(files) >= page.get("total", 0):
+                    return files
         except requests.RequestException as e:
             print(f"Error fetching files: {e}")
-            return []
+            return files
 
-    def upload_files(self, files: List[Any]) -> bool:
-        """Uploads a list of Streamlit file objects."""
+    def upload_files(self, files: List[Any], incremental: bool = True) -> Optional[str]:
+        """
+        Uploads a list of Streamlit file objects in resumable chunks and returns
+        the ingestion job id. Incremental mode only re-processes changed pages
+        of files uploaded before.
+        """
         if not files:
-            return False
-        
-        # Prepare files for multipart/form-data
-        files_payload = [
-            ('files', (f.name, f.getvalue(), f.type)) for f in files
-        ]
+            return None
         
         try:
-            response = requests.post(f"{self.base_url}/documents/upload", files=files_payload)
-            return response.status_code == 200
+            upload_ids = [self._upload_file(f) for f in files]
+            response = self.session.post(
+                f"{self.base_url}/documents/uploads/complete", 
+                json={"upload_ids": upload_ids, "incremental": incremental}, 
+                headers=self.headers, 
+                timeout=30
+            )
+            response.raise_for_status()
+            return response.json().get("job_id")
         except requests.RequestException as e:
             print(f"Error uploading files: {e}")
-            return False
+            return None
+
+    def _upload_file(self, f: Any) -> str:
+        """
+        Sends one file chunk by chunk. After a failed chunk it asks the backend
+        for the offset it has and resumes from there instead of from zero.
+        """
+        response = self.session.post(
+            f"{self.base_url}/documents/uploads", 
+            json={"filename": f.name, "size": f.size}, 
+            headers=self.headers, 
+            timeout=10
+        )
+        response.raise_for_status()
+        upload_id = response.json()["upload_id"]
+        url = f"{self.base_url}/documents/uploads/{upload_id}"
+
+        offset, failures = 0, 0
+        while offset < f.size:
+            f.seek(offset)
+            chunk = f.read(self.upload_chunk_size)
+            try:
+                response = self.session.put(
+                    url, params={"offset": offset}, data=chunk, 
+                    headers=self.headers, timeout=self.upload_timeout
+                )
+                response.raise_for_status()
+                offset = response.json()["offset"]
+                failures = 0
+            except requests.RequestException as e:
+                failures += 1
+                if failures > self.upload_retries:
+                    raise
+                print(f"Upload of {f.name} interrupted at byte {offset}, retrying: {e}")
+                time.sleep(min(2 ** failures, 30))
+                try:
+                    status = self.session.get(url, headers=self.headers, timeout=10)
+                    status.raise_for_status()
+                    offset = status.json()["offset"]
+                except requests.RequestException:
+                    pass
+        return upload_id
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch the progress of an ingestion job."""
+        try:
+            response = self.session.get(
+                f"{self.base_url}/documents/jobs/{job_id}", 
+                headers=self.headers, 
+                timeout=10
+            )
+            response.raise_for_status()
+            return response.json()
+        except requests.RequestException as e:
+            print(f"Error fetching job {job_id}: {e}")
+            return None
 
     def delete_file(self, filename: str) -> bool:
         """Deletes a file by name."""
         try:
-            response = requests.delete(f"{self.base_url}/documents/{filename}")
+            response = self.session.delete(f"{self.base_url}/documents/{filename}", timeout=30)
             return response.status_code == 200
         except requests.RequestException as e:
             print(f"Error deleting file: {e}")
             return False
 
+    def delete_files(self, filenames: List[str]) -> Optional[Dict[str, str]]:
+        """Deletes several files in one request. Returns {filename: status}, or None on failure."""
+        try:
+            response = self.session.post(
+                f"{self.base_url}/documents/bulk-delete",
+                json={"filenames": filenames},
+                headers=self.headers,
+                timeout=120
+            )
+            response.raise_for_status()
+            return {r["filename"]: r["status"] for r in response.json().get("results", [])}
+        except requests.RequestException as e:
+            print(f"Error deleting files: {e}")
+            return None
+
+    def create_session(self) -> Optional[str]:
+        """Starts a server-side chat session and returns its id."""
+        try:
+            response = self.session.post(
+                f"{self.base_url}/chat/sessions", 
+                headers=self.headers, 
+                timeout=10
+            )
+            response.raise_for_status()
+            return response.json().get("session_id")
+        except requests.RequestException as e:
+            print(f"Error creating chat session: {e}")
+            return None
+
+    def delete_session(self, session_id: str) -> bool:
+        """Drops a server-side chat session with its history and summary."""
+        try:
+            response = self.session.delete(
+                f"{self.base_url}/chat/sessions/{session_id}",
+                headers=self.headers,
+                timeout=10
+            )
+            return response.status_code in (200, 404)
+        except requests.RequestException as e:
+            print(f"Error deleting chat session: {e}")
+            return False
+
+    def session_chat_stream(self, session_id: str, message: str, selected_files=None) -> Generator[Dict, None, None]:
+        """
+        Sends only the new message of a server-side session and yields the
+        structured response chunks. Yields {"type": "session_expired"} if the
+        backend no longer knows the session.
+        """
+        url = f"{self.base_url}/chat/sessions/{session_id}/messages"
+
+        payload = {
+            "message": message, 
+            "selected_files": selected_files if selected_files else [] 
+        }
+        
+        try:
+            with self.session.post(url, json=payload, stream=True, timeout=(self.connect_timeout, self.stream_timeout)) as response:
+                if response.status_code == 404:
+                    yield {"type": "session_expired"}
+                    return
+                if response.status_code == 429:
+                    yield {"type": "error", "data": response.json().get("detail", "Server is busy. Try again shortly.")}
+                    return
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if line:
+                        try:
+                            data = json.loads(line.decode("utf-8"))
+                            yield data
+                        except json.JSONDecodeError:
+                            continue
+        except requests.RequestException as e:
+            yield {"type": "error", "data": f"Connection error: {e}"}
+
     def chat_stream(self, message: str, history: List[Dict[str, str]], selected_files=None) -> Generator[Dict, None, None]:
         """
         Yields structured data chunks (JSON) from the backend.
@@ -62,7 +234,10 @@ class APIClient:
         }
         
         try:
-            with requests.post(url, json=payload, stream=True) as response:
+            with self.session.post(url, json=payload, stream=True, timeout=(self.connect_timeout, self.stream_timeout)) as response:
+                if response.status_code == 429:
+                    yield {"type": "error", "data": response.json().get("detail", "Server is busy. Try again shortly.")}
+                    return
                 response.raise_for_status()
                 for line in response.iter_lines():
                     if line:
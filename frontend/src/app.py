@@ -10,11 +10,16 @@ st.set_page_config(
     layout="wide"
 )
 
+@st.cache_resource
+def get_api_client():
+    # Shared by all browser sessions so its connection pool is reused
+    return APIClient()
+
 def main():
     st.title("🤖 Academic Buddy")
     
-    # Initialize the API Client once
-    api = APIClient()
+    # Initialize the API Client once per process
+    api = get_api_client()
 
     # Render Components
     render_sidebar(api)
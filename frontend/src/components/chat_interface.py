@@ -1,7 +1,13 @@
 import streamlit as st
 import html
+import os
+import time
 from src.api_client import APIClient
 
+# Seconds between re-renders of a streaming answer; re-rendering the whole
+# markdown on every frame is quadratic in the answer length
+RENDER_INTERVAL = float(os.getenv("CHAT_RENDER_INTERVAL", 0.25))
+
 # Define CSS globally to ensure it never breaks due to indentation
 CHAT_CSS = """
 <style>
@@ -58,30 +64,29 @@ def render_chat(api: APIClient):
 
         with st.chat_message("assistant"):
             message_placeholder = st.empty()
-            full_response = ""
+            response_parts = []
             retrieved_sources = []
+            last_render = 0.0
             
-            chat_history = [
-                {"role": m["role"], "content": m["content"]} 
-                for m in st.session_state.messages[:-1]
-            ]
-
             selected_files = st.session_state.get("selected_files_list", [])
             
-            stream_generator = api.chat_stream(prompt, chat_history, selected_files)
-            
-            for chunk in stream_generator:
+            for chunk in stream_session_chat(api, prompt, selected_files):
                 chunk_type = chunk.get("type")
                 chunk_data = chunk.get("data")
 
-                if chunk_type == "sources":
+                if chunk_type == "status":
+                    message_placeholder.markdown(f"_{chunk_data}…_")
+                elif chunk_type == "sources":
                     retrieved_sources = chunk_data
                 elif chunk_type == "content":
-                    full_response += chunk_data
-                    message_placeholder.markdown(full_response + "▌")
+                    response_parts.append(chunk_data)
+                    if time.monotonic() - last_render >= RENDER_INTERVAL:
+                        message_placeholder.markdown("".join(response_parts) + "▌")
+                        last_render = time.monotonic()
                 elif chunk_type == "error":
                     st.error(chunk_data)
 
+            full_response = "".join(response_parts)
             message_placeholder.markdown(full_response)
             
             if retrieved_sources:
@@ -93,6 +98,29 @@ def render_chat(api: APIClient):
                 "sources": retrieved_sources
             })
 
+def stream_session_chat(api: APIClient, prompt, selected_files):
+    """
+    Streams one turn of the server-side session, which holds the history.
+    Starts a new session when there is none yet or the backend has dropped it.
+    """
+    for attempt in range(2):
+        if not st.session_state.get("session_id"):
+            st.session_state.session_id = api.create_session()
+            if not st.session_state.session_id:
+                yield {"type": "error", "data": "Could not start a chat session."}
+                return
+
+        expired = False
+        for chunk in api.session_chat_stream(st.session_state.session_id, prompt, selected_files):
+            if chunk.get("type") == "session_expired":
+                expired = True
+                break
+            yield chunk
+
+        if not expired:
+            return
+        st.session_state.session_id = None
+
 def display_sources(sources):
     """Helper to render sources as HTML pills with tooltips."""
     
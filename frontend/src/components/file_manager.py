@@ -30,26 +30,25 @@ def render_sidebar(api: APIClient):
                 if f.name not in st.session_state.processed_files
             ]
 
-            # Auto-Process
+            # Auto-Process (ingestion runs in the background on the server)
             if new_files:
-                with st.spinner(f"Auto-processing {len(new_files)} new file(s)..."):
-                    success = api.upload_files(new_files)
-                    if success:
-                        # Mark these files as processed
-                        for f in new_files:
-                            st.session_state.processed_files.add(f.name)
-                        
-                        st.success("Files processed!")
-                        
-                        # Invalidate cache to force list refresh
-                        if "file_list" in st.session_state:
-                            del st.session_state["file_list"]
-                        
-                        # Increment key to reset the uploader widget
-                        st.session_state.uploader_key += 1
-                        st.rerun()
-                    else:
-                        st.error("Upload failed.")
+                job_id = api.upload_files(new_files)
+                if job_id:
+                    # Mark these files as processed
+                    for f in new_files:
+                        st.session_state.processed_files.add(f.name)
+
+                    st.session_state.active_jobs = st.session_state.get("active_jobs", []) + [job_id]
+                    
+                    # Increment key to reset the uploader widget
+                    st.session_state.uploader_key += 1
+                    st.rerun()
+                else:
+                    st.error("Upload failed.")
+
+        # --- Ingestion Progress ---
+        if st.session_state.get("active_jobs"):
+            render_job_progress(api)
 
         st.divider()
 
@@ -90,21 +89,69 @@ def render_sidebar(api: APIClient):
 
             if st.button("🗑️ Delete Selected", type="primary", use_container_width=True, disabled=len(selected_files) == 0):
                 with st.spinner(f"Deleting {len(selected_files)} file(s)..."):
-                    for filename in selected_files:
-                        api.delete_file(filename)
-                        
-                        # Clean up 'processed' memory so it can be re-uploaded immediately if desired
-                        if filename in st.session_state.processed_files:
-                            st.session_state.processed_files.remove(filename)
+                    results = api.delete_files(selected_files)
+                    if results is None:
+                        st.error("Delete failed.")
+                    else:
+                        for filename in results:
+                            # Clean up 'processed' memory so it can be re-uploaded immediately if desired
+                            if filename in st.session_state.processed_files:
+                                st.session_state.processed_files.remove(filename)
 
-                    # Refresh the list
-                    if "file_list" in st.session_state:
-                        del st.session_state["file_list"]
-                    
-                    st.success("Files deleted.")
-                    st.rerun()
+                        # Refresh the list
+                        if "file_list" in st.session_state:
+                            del st.session_state["file_list"]
+                        
+                        st.success("Files deleted.")
+                        st.rerun()
 
         st.divider()
         if st.button("Clear Chat History", use_container_width=True):
             st.session_state.messages = []
-            st.rerun()
\ No newline at end of file
+            # Forget the server-side history too; the next message starts a new session
+            if session_id := st.session_state.pop("session_id", None):
+                api.delete_session(session_id)
+            st.rerun()
+
+STAGE_ICONS = {
+    "queued": "⏳",
+    "planning": "🔎",
+    "converting": "📄",
+    "converted": "📦",
+    "indexing": "🧮",
+    "done": "✅",
+    "failed": "❌",
+}
+
+@st.fragment(run_every="1s")
+def render_job_progress(api: APIClient):
+    """Polls the backend for ingestion progress without blocking the rest of the app."""
+    still_running = []
+    finished = False
+
+    for job_id in st.session_state.get("active_jobs", []):
+        job = api.get_job(job_id)
+        if job is None:
+            continue
+
+        for entry in job["files"]:
+            icon = STAGE_ICONS.get(entry["stage"], "•")
+            st.caption(f"{icon} {entry['filename']} — {entry['stage']}")
+            if entry.get("error"):
+                st.error(f"{entry['filename']}: {entry['error']}")
+
+        if job["finished_at"] is None:
+            still_running.append(job_id)
+        else:
+            finished = True
+            for entry in job["files"]:
+                if entry["stage"] == "failed":
+                    st.toast(f"❌ {entry['filename']}: {entry['error']}")
+
+    st.session_state.active_jobs = still_running
+
+    # Refresh the file list once any job completes
+    if finished:
+        if "file_list" in st.session_state:
+            del st.session_state["file_list"]
+        st.rerun()
\ No newline at end of file